@@ -0,0 +1,119 @@
+import numpy as np
+
+from constants import *
+
+# * Batch bot decisions: one vectorized pass for many seats (and tables)
+
+"""
+The policies here are the same EV and threshold rules as
+ConservativeBotPlayer and AdvancedBotPlayer, written over arrays so a
+multi-table run (see headless.playMultiTable) pays the Python overhead once
+per batch instead of once per seat. Tables running with
+game.deferBatchDecisions pause when one of these bots is up, the driver
+collects every paused seat, and each bot then plays the decision it was
+handed. The win probability still comes from each seat's own simulation
+"""
+
+BATCH_FOLD = 0
+BATCH_CHECK = 1
+BATCH_CALL = 2
+BATCH_RAISE = 3
+BATCH_ALL_IN = 4
+
+
+class DecisionBatch:
+    def __init__(
+        self, callAmount, pot, chips, winProbability, position, numSeats=NUM_PLAYERS
+    ):
+        self.callAmount = np.asarray(callAmount, dtype=np.float64)
+        self.pot = np.asarray(pot, dtype=np.float64)
+        self.chips = np.asarray(chips, dtype=np.float64)
+        self.winProbability = np.asarray(winProbability, dtype=np.float64)  # 0-1
+        self.position = np.asarray(position, dtype=np.float64)  # 0 = big blind
+        self.numSeats = np.asarray(numSeats, dtype=np.float64)  # at each table
+
+    @staticmethod
+    def fromSeats(seats):
+        # seats: (game, player) pairs, with each player up at its table
+        return DecisionBatch(
+            [game.maxRaise - player.chipsBetInRound for game, player in seats],
+            [game.pot for game, _ in seats],
+            [player.chips for _, player in seats],
+            [player.winProbability / 100 for _, player in seats],
+            [
+                (game.currentPlayerIndex - game.bigBlindIndex) % len(game.players)
+                for game, _ in seats
+            ],
+            [len(game.players) for game, _ in seats],
+        )
+
+    def __len__(self):
+        return len(self.callAmount)
+
+
+def conservativePolicy(batch, rng):
+    callAmount = batch.callAmount
+    potSize = batch.pot + callAmount
+    ev = potSize * batch.winProbability - callAmount
+
+    conservativeCheckThreshold = 15 + 0.05 * potSize
+    conservativeCallThreshold = -5
+    conservativeRaiseThreshold = 20
+
+    actions = np.full(len(batch), BATCH_FOLD)
+    actions[ev > conservativeCallThreshold] = BATCH_CALL
+
+    raising = ev > conservativeRaiseThreshold
+    actions[raising & (batch.chips >= callAmount)] = BATCH_RAISE
+    actions[raising & (batch.chips < callAmount)] = BATCH_ALL_IN
+    actions[(callAmount == 0) & (ev < conservativeCheckThreshold)] = BATCH_CHECK
+
+    raiseFactor = 1.1  # Only slightly above the minimum raise
+    amounts = np.minimum(callAmount * raiseFactor, batch.chips).astype(np.int64)
+    return actions, amounts
+
+
+def advancedPolicy(batch, rng):
+    callAmount = batch.callAmount
+    potSize = batch.pot + callAmount
+    positionFactor = (batch.numSeats - batch.position) / batch.numSeats
+    adjustedEV = (potSize * batch.winProbability - callAmount) * positionFactor
+
+    actions = np.full(len(batch), BATCH_FOLD)
+    actions[adjustedEV > -10 * positionFactor] = BATCH_CALL
+
+    positive = adjustedEV > 0
+    actions[positive & (batch.chips > 2 * callAmount)] = BATCH_RAISE
+    actions[positive & (batch.chips < callAmount)] = BATCH_ALL_IN
+    actions[(callAmount == 0) & (adjustedEV < 10 * positionFactor)] = BATCH_CHECK
+
+    # same as random.uniform(1, chips / 4), which also allows a short stack
+    quarterStack = batch.chips / 4
+    raiseSize = rng.uniform(np.minimum(1, quarterStack), np.maximum(1, quarterStack))
+    amounts = np.minimum(callAmount + raiseSize, batch.chips).astype(np.int64)
+    return actions, amounts
+
+
+BATCH_POLICIES = {
+    "conservative": conservativePolicy,
+    "advanced": advancedPolicy,
+}
+
+
+def decideBatch(games, rng):
+    """
+    Hands a decision to the bot each paused table is waiting on, grouping
+    the seats by policy so each policy runs once over all of its seats
+    """
+    seatsByPolicy = {}
+    for game in games:
+        player = game.players[game.currentPlayerIndex]
+        player.updateCheckOrCall(game)
+        player.calculatePotOdds(game)
+        seatsByPolicy.setdefault(player.batchPolicy, []).append((game, player))
+
+    for policyName, seats in seatsByPolicy.items():
+        batch = DecisionBatch.fromSeats(seats)
+        actions, amounts = BATCH_POLICIES[policyName](batch, rng)
+        for (_, player), action, amount in zip(seats, actions, amounts):
+            player.batchDecision = (int(action), int(amount))
@@ -0,0 +1,425 @@
+import argparse
+import copy
+import multiprocessing
+import pickle
+import random
+import sys
+import time
+
+import numpy as np
+from treys import Evaluator
+
+from batch import BATCH_POLICIES, DecisionBatch
+from cache import cachePath
+from equity import *
+from evaluatortables import *
+from handeval import loadHandEvaluator
+from headless import *
+from sharedtables import *
+from logic import *
+from preflop import loadPreflopEquity
+from scheduler import EquityScheduler
+from snapshot import restoreGame, snapshotGame
+from tournament import Tournament
+
+# * Benchmarks for the engine and the bots, run with: python benchmark.py <name>
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(benchmarkFn):
+        BENCHMARKS[name] = benchmarkFn
+        return benchmarkFn
+
+    return register
+
+
+@benchmark("mcts")
+def benchmarkMCTS(seconds=2.0, decisions=3):
+    # playouts per second at the first preflop decision of a few fresh hands
+    random.seed(0)
+    lineup = [MCTSBotPlayer] + [StrategyBotPlayer] * (NUM_PLAYERS - 1)
+
+    playouts = 0
+    elapsed = 0.0
+    with quietOutput():
+        for seed in range(decisions):
+            game = Game(lineup, numSimulations=100)
+            search = MCTSSearch(timeBudget=seconds / decisions, seed=seed)
+            game.currentPlayerIndex = 0
+            search.chooseAction(game, game.players[0])
+            playouts += search.lastPlayouts
+            elapsed += search.lastElapsed
+
+    return {"playoutsPerSecond": playouts / elapsed}
+
+
+@benchmark("batch")
+def benchmarkBatch(numSeats=20_000):
+    # decisions per second for one vectorized pass vs a batch per seat
+    rng = np.random.default_rng(0)
+    callAmount = rng.choice([0, 10, 20, 50, 100, 400], numSeats)
+    pot = rng.integers(30, 2_000, numSeats)
+    chips = rng.integers(0, 3 * INITIAL_CHIPS, numSeats)
+    winProbability = rng.random(numSeats)
+    position = rng.integers(0, NUM_PLAYERS, numSeats)
+
+    results = {}
+    for name, policy in BATCH_POLICIES.items():
+        startTime = time.perf_counter()
+        batch = DecisionBatch(callAmount, pot, chips, winProbability, position)
+        policy(batch, rng)
+        results[f"{name}BatchPerSecond"] = numSeats / (time.perf_counter() - startTime)
+
+        numSingle = numSeats // 20
+        startTime = time.perf_counter()
+        for i in range(numSingle):
+            single = DecisionBatch(
+                callAmount[i : i + 1],
+                pot[i : i + 1],
+                chips[i : i + 1],
+                winProbability[i : i + 1],
+                position[i : i + 1],
+            )
+            policy(single, rng)
+        results[f"{name}SinglePerSecond"] = numSingle / (
+            time.perf_counter() - startTime
+        )
+
+    return results
+
+
+@benchmark("equity")
+def benchmarkEquity(numSamples=100, repeats=100):
+    # how many times fewer samples each estimator mode needs than plain
+    spots = {
+        "preflop": (["As", "Kd"], [], 1),
+        "flop": (["7h", "7c"], ["2s", "9d", "Kh"], 2),
+        "turn": (["Qh", "Jh"], ["2h", "9h", "Kc", "3d"], 1),
+    }
+
+    results = {}
+    for spotName, (hand, board, numOpponents) in spots.items():
+        report = varianceReport(
+            [Card.new(card) for card in hand],
+            [Card.new(card) for card in board],
+            numOpponents,
+            numSamples,
+            repeats,
+        )
+        for mode, entry in report.items():
+            results[f"{spotName} {mode} fewerSamples"] = entry["fewerSamples"]
+
+    return results
+
+
+@benchmark("qmc")
+def benchmarkQMC(sampleCounts=(50, 200, 800), repeats=30):
+    # error against sample count, plain random runouts vs the qmc sampler
+    evaluator = loadEvaluator()
+    turnHand = [Card.new("Qh"), Card.new("Jh")]
+    turnBoard = [Card.new(card) for card in ["2h", "9h", "Kc", "3d"]]
+    preflopHand = [Card.new("As"), Card.new("Kd")]
+    spots = {
+        "turn": (turnHand, turnBoard, exactEquity(turnHand, turnBoard, evaluator)),
+        # too many runouts to enumerate, so compare against a long plain run
+        "preflop": (
+            preflopHand,
+            [],
+            estimateEquity(preflopHand, [], 1, 40_000, evaluator, "plain"),
+        ),
+    }
+
+    results = {}
+    for spotName, (hand, board, trueEquity) in spots.items():
+        for mode in ("plain", "qmc"):
+            errors = samplingError(
+                hand, board, 1, trueEquity, sampleCounts, repeats, mode
+            )
+            for numSamples, error in errors.items():
+                results[f"{spotName} {mode} rmse@{numSamples}"] = error
+
+    return results
+
+
+@benchmark("evaluator")
+def benchmarkEvaluator(repeats=20):
+    # milliseconds to get a working Evaluator: treys' own vs the cached tables
+    loadEvaluator()  # makes sure the cache file exists
+
+    startTime = time.perf_counter()
+    for _ in range(repeats):
+        Evaluator()
+    treysMs = (time.perf_counter() - startTime) / repeats * 1000
+
+    startTime = time.perf_counter()
+    for _ in range(repeats):
+        readEvaluatorTables(cachePath(TABLES_FILE))
+    fileMs = (time.perf_counter() - startTime) / repeats * 1000
+
+    return {"treysEvaluatorMs": treysMs, "cachedTablesMs": fileMs}
+
+
+@benchmark("handeval")
+def benchmarkHandEval(numHands=1_000_000, treysHands=50_000):
+    # 7 card hands per second, treys one at a time vs the batched evaluator
+    handEvaluator = loadHandEvaluator()
+    evaluator = loadEvaluator()
+    rng = np.random.default_rng(0)
+    deck = np.array(Deck.GetFullDeck(), dtype=np.int32)
+    cards = deck[np.argsort(rng.random((numHands, len(deck))), axis=1)[:, :7]]
+
+    startTime = time.perf_counter()
+    ranks = handEvaluator.evaluate(cards)
+    batchSeconds = time.perf_counter() - startTime
+
+    hands = cards[:treysHands].tolist()
+    startTime = time.perf_counter()
+    treysRanks = [evaluator.evaluate(hand[:2], hand[2:]) for hand in hands]
+    treysSeconds = time.perf_counter() - startTime
+
+    return {
+        "treysHandsPerSecond": treysHands / treysSeconds,
+        "batchHandsPerSecond": numHands / batchSeconds,
+        "mismatches": int((ranks[:treysHands] != treysRanks).sum()),
+    }
+
+
+@benchmark("sharedtables")
+def benchmarkSharedTables(poolSizes=(1, 2, 4)):
+    # worker startup time and private memory per worker as the pool grows
+    context = multiprocessing.get_context("spawn")  # nothing inherited
+    hand = [Card.new("As"), Card.new("Kd")]
+    jobs = [(hand, [], 1, 200, "plain")] * 8
+
+    results = {}
+    for processes in poolSizes:
+        startTime = time.perf_counter()
+        with sharedPool(processes, context) as pool:
+            pool.map(equityJob, jobs)
+            startupSeconds = time.perf_counter() - startTime
+
+            memoryByWorker = {}
+            for memory in pool.map(workerMemory, range(processes * 8)):
+                memoryByWorker[memory["pid"]] = memory
+        workers = memoryByWorker.values()
+
+        results[f"{processes} workers startup s"] = startupSeconds
+        results[f"{processes} workers private kB per worker"] = sum(
+            w["RssAnon"] for w in workers
+        ) / len(workers)
+        results[f"{processes} workers shared kB per worker"] = sum(
+            w["RssShmem"] for w in workers
+        ) / len(workers)
+
+    return results
+
+
+@benchmark("snapshot")
+def benchmarkSnapshot(actions=500):
+    # snapshot/restore after every action of headless play, vs pickle
+    random.seed(0)
+    with quietOutput():
+        game = Game([StrategyBotPlayer] * NUM_PLAYERS, numSimulations=50)
+
+    snapshotSeconds = restoreSeconds = pickleSeconds = 0.0
+    snapshotBytes = pickleBytes = 0
+    with quietOutput():
+        for _ in range(actions):
+            if game.handState == HAND_OVER:
+                game.resetGame()
+            game.step()
+
+            startTime = time.perf_counter()
+            data = snapshotGame(game)
+            snapshotSeconds += time.perf_counter() - startTime
+
+            startTime = time.perf_counter()
+            restoreGame(data)
+            restoreSeconds += time.perf_counter() - startTime
+
+            evaluator, game.evaluator = game.evaluator, None  # megabytes of tables
+            startTime = time.perf_counter()
+            pickled = pickle.dumps(game)
+            pickle.loads(pickled)
+            pickleSeconds += time.perf_counter() - startTime
+            game.evaluator = evaluator
+
+            snapshotBytes += len(data)
+            pickleBytes += len(pickled)
+
+    return {
+        "snapshot us": snapshotSeconds / actions * 1e6,
+        "restore us": restoreSeconds / actions * 1e6,
+        "pickle round trip us": pickleSeconds / actions * 1e6,
+        "snapshot bytes": snapshotBytes / actions,
+        "pickle bytes": pickleBytes / actions,
+    }
+
+
+@benchmark("clone")
+def benchmarkClone(clones=20_000, deepCopies=200):
+    # Game.clone vs copy.deepcopy of a table mid-hand (evaluator left shared)
+    random.seed(0)
+    with quietOutput():
+        game = Game([StrategyBotPlayer] * NUM_PLAYERS, numSimulations=50)
+        for _ in range(NUM_PLAYERS):
+            game.step()
+
+    startTime = time.perf_counter()
+    for _ in range(clones):
+        game.clone()
+    cloneSeconds = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    for _ in range(deepCopies):
+        copy.deepcopy(game, {id(game.evaluator): game.evaluator})
+    deepCopySeconds = time.perf_counter() - startTime
+
+    return {
+        "clonesPerSecond": clones / cloneSeconds,
+        "deepCopiesPerSecond": deepCopies / deepCopySeconds,
+    }
+
+
+@benchmark("duplicate")
+def benchmarkDuplicate(numDeals=30, numSimulations=20):
+    # how many times fewer hands duplicate play needs for the same error
+    duplicate = playDuplicate(numDeals, numSimulations=numSimulations, seed=0)
+    independent = playIndependent(
+        numDeals * NUM_PLAYERS, numSimulations=numSimulations, seed=1
+    )
+
+    # standard errors from the same number of hands played
+    ratios = (standardErrors(independent) / standardErrors(duplicate)) ** 2
+    return {
+        f"{bot.__name__} fewerHands": ratio
+        for bot, ratio in zip(DEFAULT_LINEUP, ratios)
+    }
+
+
+@benchmark("preflop")
+def benchmarkPreflop(lookups=2_000, numSimulations=5_000):
+    # heads-up preflop equity from the matrix vs simulating it
+    table = loadPreflopEquity()
+    if table is None:
+        print("no preflop matrix, build it with: python preflop.py")
+        return {}
+
+    evaluator = loadEvaluator()
+    rng = random.Random(0)
+    hands = [Deck(rng.getrandbits(32)).draw(NUM_PLAYER_CARDS) for _ in range(20)]
+
+    startTime = time.perf_counter()
+    for i in range(lookups):
+        table.vsRandomHand(hands[i % len(hands)])
+    lookupSeconds = time.perf_counter() - startTime
+
+    errors = []
+    startTime = time.perf_counter()
+    for hand in hands:
+        simulated = estimateEquity(hand, [], 1, numSimulations, evaluator, rng=rng)
+        errors.append(abs(table.vsRandomHand(hand) - simulated))
+    simulateSeconds = time.perf_counter() - startTime
+
+    return {
+        "lookupsPerSecond": lookups / lookupSeconds,
+        "simulationsPerSecond": len(hands) / simulateSeconds,
+        "meanAbsError": float(np.mean(errors)),
+        "maxAbsError": float(np.max(errors)),
+    }
+
+
+@benchmark("scheduler")
+def benchmarkScheduler(numSimulations=2_000, deadline=0.05, streets=6):
+    # seconds from a street being dealt until the first seat can act
+    results = {}
+    for name, scheduler in (
+        ("allSeats", None),
+        ("scheduled", EquityScheduler(deadline)),
+    ):
+        random.seed(0)
+        with quietOutput():
+            game = Game([StrategyBotPlayer] * NUM_PLAYERS, numSimulations=50)
+        game.numSimulations = numSimulations
+        game.equityScheduler = scheduler
+
+        waits = []
+        for _ in range(streets):
+            game.handsPlayed += 1  # or the scheduler reuses the last street's jobs
+            firstToAct = game.players[(game.currentPlayerIndex + 1) % NUM_PLAYERS]
+            startTime = time.perf_counter()
+            with quietOutput():
+                game.updateAllPlayersPotOdds()
+                firstToAct.calculatePotOdds(game)
+            waits.append(time.perf_counter() - startTime)
+        results[f"{name} firstActionSeconds"] = float(np.median(waits))
+    return results
+
+
+@benchmark("prefetch")
+def benchmarkPrefetch(numSimulations=1_000, thinkSeconds=5.0, hands=3):
+    # seconds from a street being dealt until every seat has its equity, with
+    # and without the human's think time spent on the next street first
+    results = {}
+    for name, prefetch in (("cold", False), ("prefetched", True)):
+        random.seed(0)
+        waits = []
+        for _ in range(hands):
+            with quietOutput():
+                game = Game([StrategyBotPlayer] * NUM_PLAYERS, numSimulations=50)
+            game.numSimulations = numSimulations
+            scheduler = EquityScheduler(thinkSeconds, background=False)
+            game.equityScheduler = scheduler
+            scheduler.schedule(game)
+
+            while game.stage < 3:
+                if prefetch:
+                    scheduler.prefetch(game)
+                scheduler.refine(thinkSeconds)  # the human thinking
+                startTime = time.perf_counter()
+                with quietOutput():
+                    game.advanceStage()
+                    for player in game.players:
+                        player.calculatePotOdds(game)
+                waits.append(time.perf_counter() - startTime)
+        results[f"{name} streetSeconds"] = float(np.median(waits))
+    return results
+
+
+@benchmark("tournament")
+def benchmarkTournament(numEntrants=100, numSimulations=100):
+    # a small bot MTT start to finish, in one process
+    tournament = Tournament(numEntrants, numSimulations=numSimulations, seed=0)
+    startTime = time.perf_counter()
+    tournament.play()
+    elapsed = time.perf_counter() - startTime
+    return {
+        "seconds": elapsed,
+        "hands": tournament.handsPlayed,
+        "handsPerSecond": tournament.handsPlayed / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run engine benchmarks")
+    parser.add_argument("names", nargs="*", help=f"any of {', '.join(BENCHMARKS)}")
+    args = parser.parse_args(argv)
+
+    for name in args.names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name}")
+
+        startTime = time.perf_counter()
+        results = BENCHMARKS[name]()
+        elapsed = time.perf_counter() - startTime
+
+        print(f"{name} ({elapsed:.1f}s)")
+        for metric, value in results.items():
+            precision = 1 if abs(value) >= 100 else 4  # rates vs errors and ratios
+            print(f"  {metric}: {value:,.{precision}f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,231 @@
+import argparse
+import itertools
+import random
+import sys
+import time
+
+import numpy as np
+from treys import Card, Deck
+
+from cache import atomicWrite, cachePath
+from constants import *
+from evaluatortables import loadEvaluator
+from metrics import METRICS
+
+# * Expected hand strength (EHS) buckets, looked up instead of simulated
+
+"""
+Every (hole cards, board) situation is reduced to a canonical form under
+suit isomorphism: suits are relabeled in order of which ranks they hold in
+the hand and on the board, so e.g. AsKs on 2s7h9d and AhKh on 2h7c9s end
+up with the same key. Hole cards and board cards are then packed into a
+single 42 bit integer (7 slots of 6 bits, 0 for a missing card).
+
+The offline build (python buckets.py) stores the sorted keys and their
+buckets as .npy files that are memory-mapped on load. It only does
+preflop unless asked for --streets preflop flop, since the 1.29M flop
+situations take a long time. Anything that isn't in the file (turns and
+rivers, or streets that weren't built) is simulated once and remembered,
+so lookups work for every situation
+"""
+
+NUM_HAND_BUCKETS = 10
+KEYS_FILE = "handbuckets_keys.npy"
+BUCKETS_FILE = "handbuckets_values.npy"
+BUILD_SAMPLES = 100
+RUNTIME_SAMPLES = 100
+MAX_MEMO_SIZE = 200_000
+
+# (suit index, rank) for every card int, so keys don't go through Card calls
+CARD_SUIT_RANK = {
+    card: ("shdc".index(Card.int_to_str(card)[1]), Card.get_rank_int(card))
+    for card in Deck.GetFullDeck()
+}
+
+
+def canonicalKey(hand, board):
+    masks = [0, 0, 0, 0]  # hand ranks in the high 13 bits, board ranks below
+    for card in hand:
+        suit, rank = CARD_SUIT_RANK[card]
+        masks[suit] |= 1 << (rank + 13)
+    for card in board:
+        suit, rank = CARD_SUIT_RANK[card]
+        masks[suit] |= 1 << rank
+
+    # suits with the same (hand ranks, board ranks) are interchangeable
+    suitOrder = sorted(range(4), key=masks.__getitem__)
+    newSuit = [0, 0, 0, 0]
+    for i, suit in enumerate(suitOrder):
+        newSuit[suit] = i
+
+    key = 0
+    for cards, numSlots in ((hand, NUM_PLAYER_CARDS), (board, NUM_COMMUNITY_CARDS)):
+        codes = [0] * (numSlots - len(cards))
+        for card in cards:
+            suit, rank = CARD_SUIT_RANK[card]
+            codes.append(rank * 4 + newSuit[suit] + 1)
+        codes.sort()
+        for code in codes:
+            key = (key << 6) | code
+    return key
+
+
+def expectedHandStrength(hand, board, evaluator, samples, rng=random):
+    """
+    Chance of beating (ties count half) one random opponent once the board
+    is complete, averaged over random runouts
+    """
+    known = set(hand + board)
+    remaining = [card for card in Deck.GetFullDeck() if card not in known]
+    numCommunityNeeded = NUM_COMMUNITY_CARDS - len(board)
+
+    score = 0.0
+    for _ in range(samples):
+        drawn = rng.sample(remaining, NUM_PLAYER_CARDS + numCommunityNeeded)
+        fullBoard = board + drawn[NUM_PLAYER_CARDS:]
+        myRank = evaluator.evaluate(hand, fullBoard)
+        opponentRank = evaluator.evaluate(drawn[:NUM_PLAYER_CARDS], fullBoard)
+        if myRank < opponentRank:
+            score += 1
+        elif myRank == opponentRank:
+            score += 0.5
+
+    return score / samples
+
+
+def strengthToBucket(strength):
+    return min(int(strength * NUM_HAND_BUCKETS), NUM_HAND_BUCKETS - 1)
+
+
+class HandStrengthIndex:
+    def __init__(self, keys, buckets, evaluator=None):
+        self.keys = keys  # sorted canonical keys
+        self.buckets = buckets
+        self.evaluator = evaluator or loadEvaluator()
+        self.memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fromFiles(keysPath=None, bucketsPath=None):
+        keysPath = keysPath or cachePath(KEYS_FILE)
+        bucketsPath = bucketsPath or cachePath(BUCKETS_FILE)
+        try:
+            keys = np.load(keysPath, mmap_mode="r")
+            buckets = np.load(bucketsPath, mmap_mode="r")
+        except FileNotFoundError:
+            # nothing built yet, every lookup gets simulated (and remembered)
+            keys = np.zeros(0, dtype=np.int64)
+            buckets = np.zeros(0, dtype=np.uint8)
+        return HandStrengthIndex(keys, buckets)
+
+    def lookup(self, hand, board):
+        key = canonicalKey(hand, board)
+        if key in self.memo:
+            self.hits += 1
+            return self.memo[key]
+
+        if len(self.memo) >= MAX_MEMO_SIZE:
+            self.memo.clear()
+
+        i = np.searchsorted(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            self.hits += 1
+            self.memo[key] = int(self.buckets[i])
+            return self.memo[key]
+
+        self.misses += 1
+        strength = expectedHandStrength(hand, board, self.evaluator, RUNTIME_SAMPLES)
+        self.memo[key] = strengthToBucket(strength)
+        return self.memo[key]
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+_handStrengthIndex = None
+
+
+def loadHandStrengthIndex():
+    global _handStrengthIndex
+
+    if _handStrengthIndex is None:
+        _handStrengthIndex = HandStrengthIndex.fromFiles()
+    return _handStrengthIndex
+
+
+METRICS.addGauge(
+    "hand bucket cache hit rate", lambda: loadHandStrengthIndex().hitRate()
+)
+
+
+def useHandStrengthIndex(index):
+    # e.g. one backed by shared memory (see sharedtables.py)
+    global _handStrengthIndex
+
+    _handStrengthIndex = index
+
+
+def handStrengthBucket(hand, board):
+    return loadHandStrengthIndex().lookup(hand, board)
+
+
+# * Offline build
+
+
+def canonicalSituations(numBoardCards):
+    # one representative (hand, board) per canonical key
+    fullDeck = Deck.GetFullDeck()
+    preflop = {}
+    for hand in itertools.combinations(fullDeck, NUM_PLAYER_CARDS):
+        preflop.setdefault(canonicalKey(hand, []), list(hand))
+    if numBoardCards == 0:
+        return {key: (hand, []) for key, hand in preflop.items()}
+
+    situations = {}
+    for hand in preflop.values():
+        remaining = [card for card in fullDeck if card not in hand]
+        for board in itertools.combinations(remaining, numBoardCards):
+            key = canonicalKey(hand, board)
+            if key not in situations:
+                situations[key] = (hand, list(board))
+    return situations
+
+
+def buildIndex(streets, samples=BUILD_SAMPLES, seed=0):
+    rng = random.Random(seed)
+    evaluator = loadEvaluator()
+    streetBoardCards = {"preflop": 0, "flop": NUM_FLOP_CARDS}
+
+    keys = []
+    buckets = []
+    for street in streets:
+        startTime = time.perf_counter()
+        situations = canonicalSituations(streetBoardCards[street])
+        print(f"{street}: {len(situations):,} canonical situations")
+
+        for i, (key, (hand, board)) in enumerate(situations.items()):
+            strength = expectedHandStrength(hand, board, evaluator, samples, rng)
+            keys.append(key)
+            buckets.append(strengthToBucket(strength))
+            if i % 50_000 == 0 and i:
+                print(f"  {i:,} done ({time.perf_counter() - startTime:.0f}s)")
+
+    order = np.argsort(np.array(keys, dtype=np.int64))
+    with atomicWrite(cachePath(KEYS_FILE)) as keysFile:
+        np.save(keysFile, np.array(keys, dtype=np.int64)[order])
+    with atomicWrite(cachePath(BUCKETS_FILE)) as bucketsFile:
+        np.save(bucketsFile, np.array(buckets, dtype=np.uint8)[order])
+    print(f"Wrote {len(keys):,} buckets to {cachePath(KEYS_FILE).parent}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the hand strength index")
+    parser.add_argument(
+        "--streets", nargs="+", choices=["preflop", "flop"], default=["preflop"]
+    )
+    parser.add_argument("--samples", type=int, default=BUILD_SAMPLES)
+    args = parser.parse_args(sys.argv[1:])
+
+    buildIndex(args.streets, args.samples)
@@ -0,0 +1,37 @@
+import contextlib
+import os
+import pathlib
+import tempfile
+
+# * On-disk cache for tables that are built offline (not checked in)
+
+"""
+Tables are also built lazily the first time they're needed, possibly by
+several pool workers at once, and read with mmap or np.load. So they're
+written through atomicWrite: to a temporary file next to the real one,
+then renamed over it, and a reader only ever sees a whole file or none
+"""
+
+CACHE_DIR = pathlib.Path(__file__).parent / "cache"
+
+
+def cachePath(fileName):
+    CACHE_DIR.mkdir(exist_ok=True)
+    return CACHE_DIR / fileName
+
+
+@contextlib.contextmanager
+def atomicWrite(path):
+    # a binary file that replaces path once it's closed without an error
+    path = pathlib.Path(path)
+    tempFile = tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    )
+    try:
+        with tempFile:
+            yield tempFile
+        os.chmod(tempFile.name, 0o644)  # temporary files are made owner-only
+        os.replace(tempFile.name, path)
+    except BaseException:
+        os.unlink(tempFile.name)
+        raise
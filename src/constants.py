@@ -9,3 +9,11 @@ Y_OFFSET = 100
 SMALL_BLIND_AMOUNT = 10
 BIG_BLIND_AMOUNT = 20
 INITIAL_CHIPS = 1000
+
+# hand lifecycle states (see Game.run)
+HAND_BETTING = "betting"
+HAND_WAITING = "waiting"  # waiting on the human player (or a batch decision)
+HAND_OVER = "over"
+
+MCTS_TIME_BUDGET = 0.5  # seconds of search per MCTSBotPlayer decision
+EQUITY_DEADLINE = 0.25  # seconds the next seat's equity may take (see scheduler.py)
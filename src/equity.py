@@ -0,0 +1,266 @@
+import itertools
+import random
+import statistics
+
+import numpy as np
+from treys import Deck
+
+from constants import *
+from evaluatortables import loadEvaluator
+from handeval import loadHandEvaluator
+
+# * Equity (win probability) estimation by sampling runouts
+
+"""
+Every mode estimates the same thing as the original
+Player.calculateWinningProbability: the chance that our hand is at least as
+good as every opponent's, with the opponents' hands and the rest of the
+board dealt at random. numSamples is always the number of runouts
+evaluated, so modes can be compared at the same cost.
+
+  plain       independent runouts
+  crn         common random numbers: the runouts come from one shared
+              shuffle per sample, so seats (or the same seat on the same
+              street) see nearly the same runouts. Single estimates are no
+              better than plain, but differences between them are
+  stratified  one card of every runout (the last board card, or an
+              opponent's card on the river) cycles evenly through every
+              card left, instead of being drawn at random
+  qmc         quasi-Monte Carlo: each runout is unranked from a point of a
+              randomly shifted Kronecker sequence, which fills the space of
+              remaining cards evenly instead of clumping
+  batched     plain runouts, but all of them dealt and ranked in one go with
+              numpy (see handeval.py), so a sample costs next to nothing
+
+varianceReport measures how many fewer samples each mode needs than plain
+for the same standard error (see benchmark.py equity)
+"""
+
+ESTIMATOR_MODES = ("plain", "crn", "stratified", "qmc", "batched")
+FULL_DECK = Deck.GetFullDeck()
+
+
+def isWin(hand, drawn, board, numOpponents, evaluator):
+    # drawn: opponents' hole cards first, then the missing board cards
+    numHoleCards = NUM_PLAYER_CARDS * numOpponents
+    fullBoard = board + drawn[numHoleCards:]
+    myRank = evaluator.evaluate(hand, fullBoard)
+    for i in range(0, numHoleCards, NUM_PLAYER_CARDS):
+        if evaluator.evaluate(drawn[i : i + NUM_PLAYER_CARDS], fullBoard) < myRank:
+            return 0
+    return 1
+
+
+def kroneckerAlphas(dimensions):
+    # generalized golden ratio: phi is the positive root of x^(d + 1) = x + 1
+    phi = 2.0
+    for _ in range(30):
+        phi = (1 + phi) ** (1 / (dimensions + 1))
+    return [(1 / phi) ** (k + 1) % 1 for k in range(dimensions)]
+
+
+def unrankDraw(point, remaining):
+    # each coordinate picks one of the cards still left, so a uniform point
+    # gives a uniform draw without replacement
+    pool = remaining[:]
+    return [pool.pop(int(u * len(pool))) for u in point]
+
+
+def batchedOutcomes(hand, board, remaining, numOpponents, numSamples, numDrawn, rng):
+    # a numpy stream seeded from rng, so a seeded rng still repeats
+    generator = np.random.default_rng(rng.getrandbits(64))
+    order = generator.random((numSamples, len(remaining))).argsort(axis=1)
+    drawn = np.array(remaining, dtype=np.int32)[order[:, :numDrawn]]
+    if numOpponents == 0:
+        return np.ones(numSamples)
+
+    numHoleCards = NUM_PLAYER_CARDS * numOpponents
+    cards = np.empty((numSamples, numOpponents + 1, 7), dtype=np.int32)
+    cards[:, 0, :NUM_PLAYER_CARDS] = hand
+    cards[:, 1:, :NUM_PLAYER_CARDS] = drawn[:, :numHoleCards].reshape(
+        numSamples, numOpponents, NUM_PLAYER_CARDS
+    )
+    cards[:, :, NUM_PLAYER_CARDS : NUM_PLAYER_CARDS + len(board)] = board
+    cards[:, :, NUM_PLAYER_CARDS + len(board) :] = drawn[:, None, numHoleCards:]
+
+    ranks = loadHandEvaluator().evaluate(cards.reshape(-1, 7))
+    ranks = ranks.reshape(numSamples, numOpponents + 1)
+    return (ranks[:, 0] <= ranks[:, 1:].min(axis=1)).astype(np.float64)
+
+
+def sampleOutcomes(hand, board, numOpponents, numSamples, evaluator, mode, rng):
+    """
+    Returns one win/loss (1/0) per runout
+    """
+    known = set(hand + board)
+    remaining = [card for card in FULL_DECK if card not in known]
+    numDrawn = NUM_PLAYER_CARDS * numOpponents + NUM_COMMUNITY_CARDS - len(board)
+    if numDrawn == 0:
+        return [isWin(hand, [], board, numOpponents, evaluator)]  # nothing to deal
+
+    if mode == "plain":
+        return [
+            isWin(hand, rng.sample(remaining, numDrawn), board, numOpponents, evaluator)
+            for _ in range(numSamples)
+        ]
+
+    if mode == "crn":
+        outcomes = []
+        shuffled = FULL_DECK[:]
+        for _ in range(numSamples):
+            rng.shuffle(shuffled)
+            drawn = [card for card in shuffled if card not in known][:numDrawn]
+            outcomes.append(isWin(hand, drawn, board, numOpponents, evaluator))
+        return outcomes
+
+    if mode == "stratified":
+        # the stratified card goes last, where the last board card is dealt,
+        # except on the river: the board is full, so it goes first and is an
+        # opponent's card
+        strata = remaining[:]
+        rng.shuffle(strata)
+        outcomes = []
+        for i in range(numSamples):
+            firstCard = strata[i % len(strata)]
+            rest = rng.sample([c for c in remaining if c != firstCard], numDrawn - 1)
+            drawn = (
+                [firstCard] + rest
+                if len(board) == NUM_COMMUNITY_CARDS
+                else rest + [firstCard]
+            )
+            outcomes.append(isWin(hand, drawn, board, numOpponents, evaluator))
+        return outcomes
+
+    if mode == "qmc":
+        alphas = kroneckerAlphas(numDrawn)
+        shift = [rng.random() for _ in range(numDrawn)]  # keeps it unbiased
+        outcomes = []
+        for i in range(1, numSamples + 1):
+            point = [(s + i * a) % 1 for s, a in zip(shift, alphas)]
+            drawn = unrankDraw(point, remaining)
+            outcomes.append(isWin(hand, drawn, board, numOpponents, evaluator))
+        return outcomes
+
+    if mode == "batched":
+        return batchedOutcomes(
+            hand, board, remaining, numOpponents, numSamples, numDrawn, rng
+        )
+
+    raise ValueError(f"unknown estimator mode {mode}")
+
+
+def callDecision(winProbability, pot, callAmount):
+    # (pot odds, worth calling) for a win probability in percent
+    if callAmount <= 0:
+        return float("inf"), True
+
+    potOdds = pot / callAmount
+    return potOdds, winProbability > (1 / (1 + potOdds)) * 100
+
+
+def estimateEquity(
+    hand, board, numOpponents, numSamples, evaluator, mode="plain", rng=random
+):
+    outcomes = sampleOutcomes(
+        hand, board, numOpponents, numSamples, evaluator, mode, rng
+    )
+    return sum(outcomes) / len(outcomes)
+
+
+def exactEquity(hand, board, evaluator):
+    # every runout against one opponent, only practical from the turn on
+    known = set(hand + board)
+    remaining = [card for card in FULL_DECK if card not in known]
+    numCommunityNeeded = NUM_COMMUNITY_CARDS - len(board)
+
+    wins = 0
+    total = 0
+    for runout in itertools.combinations(remaining, numCommunityNeeded):
+        left = [card for card in remaining if card not in runout]
+        for opponentHand in itertools.combinations(left, NUM_PLAYER_CARDS):
+            wins += isWin(hand, list(opponentHand) + list(runout), board, 1, evaluator)
+            total += 1
+    return wins / total
+
+
+def samplingError(hand, board, numOpponents, trueEquity, sampleCounts, repeats, mode):
+    # root mean squared error of the estimate at each sample count
+    evaluator = loadEvaluator()
+    rng = random.Random(0)
+    errors = {}
+    for numSamples in sampleCounts:
+        squaredErrors = [
+            (
+                estimateEquity(
+                    hand, board, numOpponents, numSamples, evaluator, mode, rng
+                )
+                - trueEquity
+            )
+            ** 2
+            for _ in range(repeats)
+        ]
+        errors[numSamples] = statistics.fmean(squaredErrors) ** 0.5
+    return errors
+
+
+def varianceReport(hand, board, numOpponents, numSamples=500, repeats=40, seed=0):
+    """
+    Variance of each mode's estimate over independent repeats, and how many
+    times fewer samples it needs than plain for the same standard error.
+    For crn this is about the difference between two hands' equities on the
+    same board, which is what shared runouts are for
+    """
+    evaluator = loadEvaluator()
+    rng = random.Random(seed)
+
+    report = {}
+    for mode in ESTIMATOR_MODES:
+        if mode == "crn":
+            continue
+        estimates = [
+            estimateEquity(hand, board, numOpponents, numSamples, evaluator, mode, rng)
+            for _ in range(repeats)
+        ]
+        report[mode] = {
+            "equity": statistics.fmean(estimates),
+            "variance": statistics.variance(estimates),
+        }
+
+    # a second hand to compare against, same board, no shared cards
+    known = set(hand + board)
+    otherHand = [card for card in FULL_DECK if card not in known][-NUM_PLAYER_CARDS:]
+    for mode in ("plain", "crn"):
+        differences = []
+        for _ in range(repeats):
+            streamSeed = rng.getrandbits(32)
+            first = estimateEquity(
+                hand,
+                board,
+                numOpponents,
+                numSamples,
+                evaluator,
+                mode,
+                random.Random(streamSeed),
+            )
+            secondSeed = streamSeed if mode == "crn" else rng.getrandbits(32)
+            second = estimateEquity(
+                otherHand,
+                board,
+                numOpponents,
+                numSamples,
+                evaluator,
+                mode,
+                random.Random(secondSeed),
+            )
+            differences.append(first - second)
+        report[f"{mode}Difference"] = {"variance": statistics.variance(differences)}
+
+    plainVariance = report["plain"]["variance"]
+    plainDifferenceVariance = report["plainDifference"]["variance"]
+    for mode, entry in report.items():
+        baseline = plainDifferenceVariance if "Difference" in mode else plainVariance
+        entry["fewerSamples"] = baseline / max(entry["variance"], 1e-12)
+
+    report["crn"] = report.pop("crnDifference")
+    report.pop("plainDifference")
+    return report
@@ -0,0 +1,122 @@
+import importlib.metadata
+import struct
+
+import numpy as np
+from treys import Evaluator
+from treys.lookup import LookupTable
+
+from cache import atomicWrite, cachePath
+
+# * treys lookup tables cached on disk, so an Evaluator is quick to make
+
+"""
+Evaluator() rebuilds its flush and unsuited lookup tables in pure Python
+every time. Here they are built once and written as two sorted arrays of
+(prime product, rank) pairs, then read back with a single frombuffer. The
+header records the treys version, and the file is rebuilt whenever it
+doesn't match the installed one
+"""
+
+TABLES_FILE = "evaluator_tables.bin"
+TABLES_MAGIC = b"PEVT"
+TABLES_VERSION = 1
+HEADER_FORMAT = "<4sH16sII"  # magic, version, treys version, table sizes
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+KEY_DTYPE = np.dtype("<u4")  # prime products fit in 32 bits
+RANK_DTYPE = np.dtype("<u2")  # ranks are 1 to 7462
+
+
+def treysVersion():
+    try:
+        return importlib.metadata.version("treys")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def writeEvaluatorTables(path=None):
+    path = path or cachePath(TABLES_FILE)
+    table = LookupTable()
+
+    header = struct.pack(
+        HEADER_FORMAT,
+        TABLES_MAGIC,
+        TABLES_VERSION,
+        treysVersion().encode(),
+        len(table.flush_lookup),
+        len(table.unsuited_lookup),
+    )
+    with atomicWrite(path) as tablesFile:
+        tablesFile.write(header)
+        for lookup in (table.flush_lookup, table.unsuited_lookup):
+            keys = sorted(lookup)
+            tablesFile.write(np.array(keys, dtype=KEY_DTYPE).tobytes())
+            tablesFile.write(
+                np.array([lookup[key] for key in keys], dtype=RANK_DTYPE).tobytes()
+            )
+
+
+def readEvaluatorArrays(path):
+    # flush keys, flush ranks, unsuited keys, unsuited ranks
+    data = path.read_bytes()
+    magic, version, builtWith, numFlush, numUnsuited = struct.unpack_from(
+        HEADER_FORMAT, data
+    )
+    if magic != TABLES_MAGIC or version != TABLES_VERSION:
+        raise ValueError(f"{path} is not a version {TABLES_VERSION} table")
+    if builtWith.rstrip(b"\0").decode() != treysVersion():
+        raise ValueError(f"{path} was built with treys {builtWith}")
+
+    arrays = []
+    offset = HEADER_SIZE
+    for size in (numFlush, numUnsuited):
+        for dtype in (KEY_DTYPE, RANK_DTYPE):
+            arrays.append(np.frombuffer(data, dtype, size, offset))
+            offset += arrays[-1].nbytes
+    return arrays
+
+
+def lookupTableFromArrays(flushKeys, flushRanks, unsuitedKeys, unsuitedRanks):
+    table = LookupTable.__new__(LookupTable)  # skip building it again
+    table.flush_lookup = dict(zip(flushKeys.tolist(), flushRanks.tolist()))
+    table.unsuited_lookup = dict(zip(unsuitedKeys.tolist(), unsuitedRanks.tolist()))
+    return table
+
+
+def readEvaluatorTables(path):
+    return lookupTableFromArrays(*readEvaluatorArrays(path))
+
+
+def loadEvaluatorArrays():
+    path = cachePath(TABLES_FILE)
+    try:
+        return readEvaluatorArrays(path)
+    except (FileNotFoundError, ValueError, struct.error):
+        writeEvaluatorTables(path)
+        return readEvaluatorArrays(path)
+
+
+_lookupTable = None
+
+
+def loadEvaluator():
+    # an Evaluator sharing this process's lookup table
+    global _lookupTable
+
+    if _lookupTable is None:
+        _lookupTable = lookupTableFromArrays(*loadEvaluatorArrays())
+
+    evaluator = Evaluator.__new__(Evaluator)
+    evaluator.table = _lookupTable
+    evaluator.hand_size_map = {
+        5: evaluator._five,
+        6: evaluator._six,
+        7: evaluator._seven,
+    }
+    return evaluator
+
+
+def useLookupTable(table):
+    # e.g. one built from shared memory (see sharedtables.py)
+    global _lookupTable
+
+    _lookupTable = table
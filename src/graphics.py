@@ -3,10 +3,11 @@ import pathlib
 
 from cmu_graphics import *
 from PIL import Image
-from treys import Card
 
 from constants import *
 from logic import Game
+from metrics import METRICS
+from scene import TableScene
 
 
 def setupGame(app):
@@ -18,6 +19,7 @@ def setupGame(app):
     app.foldButtonLocation = (860, 820)
 
     app.showOtherPlayersCards = False
+    app.showMetrics = False  # performance overlay, toggled with M
     app.toggleButtonLocation = (760, 880)
 
     app.betAmountStr = ""
@@ -26,102 +28,12 @@ def setupGame(app):
     app.image = app.image.resize((1200, 1000))
     app.image = CMUImage(app.image)
 
-    app.game = Game()
+    app.game = Game(equityDeadline=EQUITY_DEADLINE)
 
-
-def drawTable(app):
-    drawImage(
-        app.image,
-        app.width / 2,
-        app.height / 2,
-        align="center",
-    )
-
-    # Now we're using images, so this isn't necessary
-
-    # ovalWidth = app.width * 0.8
-    # ovalHeight = app.height * 0.6
-    # ovalX = app.width / 2
-    # ovalY = app.height / 2 - 45 - app.padding / 2
-    # drawOval(ovalX, ovalY, ovalWidth + 20, ovalHeight + 20, fill=rgb(124, 86, 70))
-    # drawOval(ovalX, ovalY, ovalWidth, ovalHeight, fill="seaGreen")
-
-
-def drawPlayerArea(app, playerIndex, player):
-    angle = 360 / NUM_PLAYERS * (playerIndex + 1)
-    centerX = app.width / 2
-    centerY = app.height / 2 - Y_OFFSET - app.padding
-    radiusX = 400
-    radiusY = 300
-
-    playerX = centerX + radiusX * cos(radians(angle))
-    playerY = centerY + radiusY * sin(radians(angle))
-    drawCircle(playerX, playerY, 30, fill="black")
-    drawLabel(str(player.chips), playerX, playerY, size=14, fill="white")
-
-    playerClassName = type(player).__name__
-    drawLabel(playerClassName, playerX, playerY - 60, size=14, fill="white")
-
-    if playerIndex == 0 or app.showOtherPlayersCards:
-        drawCards(app, playerX, playerY + 40, player.hand, player.isFolded)
-        handStrength = player.evaluateHandStrength(app.game.communityCards)
-        probLabel = f"{handStrength}, Win: {player.winProbability:.1f}%"
-        drawLabel(probLabel, playerX, playerY - 40, size=14, fill="white")
-    else:
-        drawFacedownCards(app, playerX, playerY + 40, len(player.hand), player.isFolded)
-
-
-def drawCommunityCards(app):
-    startX = app.width / 2
-    startY = app.height / 2 - Y_OFFSET - app.padding
-
-    numCardsToDraw = len(app.game.communityCards)
-    drawCards(app, startX, startY, app.game.communityCards[:numCardsToDraw])
-
-
-def drawCards(app, startX, startY, hand, isFolded=False):
-    cardWidth = 60
-    cardHeight = 90
-    cardGap = 15
-    cardsCount = len(hand)
-    cardsTotalWidth = cardsCount * cardWidth + (cardsCount - 1) * cardGap
-    startX -= cardsTotalWidth / 2
-
-    for i, card in enumerate(hand):
-        cardStr = Card.int_to_pretty_str(card)[1:-1]
-
-        if cardStr[-1] in [
-            "♥",
-            "♦",
-        ]:
-            suitColor = "red"
-        else:
-            suitColor = "black"
-
-        cardX = startX + i * (cardWidth + cardGap)
-        fillColor = "grey" if isFolded else "white"
-        drawRect(cardX, startY, cardWidth, cardHeight, fill=fillColor)
-        drawLabel(
-            cardStr,
-            cardX + cardWidth / 2,
-            startY + cardHeight / 2,
-            size=22,
-            fill=suitColor,
-        )
-
-
-def drawFacedownCards(app, startX, startY, numCards, isFolded=False):
-    cardWidth = 60
-    cardHeight = 90
-    cardGap = 15
-    cardsTotalWidth = numCards * cardWidth + (numCards - 1) * cardGap
-    startX -= cardsTotalWidth / 2
-
-    fillColor = "grey" if isFolded else "darkRed"
-
-    for i in range(numCards):
-        cardX = startX + i * (cardWidth + cardGap)
-        drawRect(cardX, startY, cardWidth, cardHeight, fill=fillColor)
+    # the checker deep-hashes the whole game (deck, evaluator tables) twice a
+    # redraw, and the retained scene lives on app anyway
+    app.disableMvcChecker = True
+    app.scene = TableScene(app)
 
 
 def drawButton(app, text, position):
@@ -159,6 +71,7 @@ def game_onMousePress(app, mouseX, mouseY):
             app.game.actionTaken = True
         else:
             print("Human player checks")
+            humanPlayer.check(app.game)
             app.game.actionTaken = True
 
     if isWithinButton(app, mouseX, mouseY, app.raiseButtonLocation):
@@ -169,7 +82,7 @@ def game_onMousePress(app, mouseX, mouseY):
         app.betAmountStr = ""
 
     elif isWithinButton(app, mouseX, mouseY, app.foldButtonLocation):
-        humanPlayer.fold()
+        humanPlayer.fold(app.game)
         print("Human player folds")
         app.game.actionTaken = True
 
@@ -189,34 +102,17 @@ def game_onKeyPress(app, key):
         # remove the last digit and update the bet button label
         app.betAmountStr = app.betAmountStr[:-1]
 
+    elif key == "m":
+        app.showMetrics = not app.showMetrics
+
 
 # * App Loop
 
 
 def game_redrawAll(app):
-    checkIfComplete(app)
-
-    raiseButtonLabel = f"Bet: ${app.betAmountStr if app.betAmountStr else '0'}"
-
-    drawTable(app)
-    for i, player in enumerate(app.game.players):
-        drawPlayerArea(app, i, player)
-    drawCommunityCards(app)
-
-    drawLabel(
-        f"Pot: ${app.game.pot}",
-        app.width / 2,
-        app.height / 2 + 20,
-        size=20,
-        fill="white",
-    )
-    humanPlayer = app.game.players[0]
-
-    toggleButtonText = "Hide" if app.showOtherPlayersCards else "Reveal"
-    drawButton(app, toggleButtonText, app.toggleButtonLocation)
-    drawButton(app, humanPlayer.checkOrCall, app.checkButtonLocation)
-    drawButton(app, raiseButtonLabel, app.raiseButtonLocation)
-    drawButton(app, "Fold", app.foldButtonLocation)
+    with METRICS.timed("redraw"):
+        checkIfComplete(app)
+        app.scene.draw(app)
 
 
 def checkIfComplete(app):
@@ -302,6 +198,14 @@ def welcome_redrawAll(app):
         align="left",
         fill="white",
     )
+    drawLabel(
+        "Press M during a game to show performance stats",
+        100,
+        440,
+        size=15,
+        align="left",
+        fill="white",
+    )
 
     drawLabel(
         "Press Enter to begin", app.width / 2, app.height - 50, size=20, fill="white"
@@ -0,0 +1,165 @@
+import itertools
+
+import numpy as np
+from treys import Card, Deck
+
+from evaluatortables import loadEvaluatorArrays
+
+# * Batched 7 card evaluation in numpy, the same ranks as treys
+
+"""
+evaluate takes an (N, 7) array of treys card ints and returns the N ranks
+Evaluator.evaluate would give (1 is a royal flush, 7462 the worst high
+card), without a Python call per hand.
+
+Byte 1 of a treys card int is its rank and suit bit, so every card maps
+through a 256 entry table to a 32 bit code: a rank weight in the low 23
+bits and a suit weight above. Adding the seven codes gives
+
+  - a rank key, unique for every multiset of seven ranks (the weights are
+    chosen so no two of the 49,205 multisets add up the same), which
+    indexes a table of the best non-flush hand those ranks make
+  - a suit key (spades 1, hearts 8, diamonds 64, clubs 0: clubs are
+    whatever's left of the seven cards), which says if a suit has five
+    or more cards
+
+Only the hands with a flush look at their suited cards: the ranks of the
+flush suit as a 13 bit mask index a table of the best flush (or straight
+flush) among them. Seven cards can't make a flush and a full house or
+quads, so that's the hand's rank. Hands are done a chunk at a time so the
+temporary arrays stay in cache.
+
+The tables are built from the cached treys lookup tables (see
+evaluatortables.py) the first time they're needed, in about a second
+"""
+
+HAND_SIZE = 7
+RANK_WEIGHTS = (0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345)
+RANK_WEIGHTS += (1479181,)
+SUIT_WEIGHTS = {1: 1, 2: 8, 4: 64, 8: 0}  # by treys suit bit (s, h, d, c)
+SUIT_SHIFT = 23
+RANK_KEY_MASK = (1 << SUIT_SHIFT) - 1
+MIN_FLUSH = 5
+CHUNK_HANDS = 1 << 15
+
+PRIMES = np.array(Card.PRIMES, dtype=np.int64)
+
+
+def primeProducts(rankSets):
+    # (N, 5) rank ints to treys lookup keys
+    return PRIMES[rankSets].prod(axis=1)
+
+
+def lookupRanks(keys, tableKeys, tableRanks):
+    return tableRanks[np.searchsorted(tableKeys, keys)]
+
+
+def buildCardCodes():
+    codes = np.zeros(256, dtype=np.uint32)
+    for card in Deck.GetFullDeck():
+        rank, suitBit = Card.get_rank_int(card), Card.get_suit_int(card)
+        codes[(card >> 8) & 0xFF] = RANK_WEIGHTS[rank] | (
+            SUIT_WEIGHTS[suitBit] << SUIT_SHIFT
+        )
+    return codes
+
+
+def buildFlushSuits():
+    # suit key to the flush suit's bit, 0 for no flush
+    flushSuits = np.zeros(1 << (32 - SUIT_SHIFT), dtype=np.uint8)
+    for spades, hearts, diamonds in itertools.product(range(HAND_SIZE + 1), repeat=3):
+        clubs = HAND_SIZE - spades - hearts - diamonds
+        if clubs < 0:
+            continue
+        key = spades * 1 + hearts * 8 + diamonds * 64
+        for suitBit, count in ((1, spades), (2, hearts), (4, diamonds), (8, clubs)):
+            if count >= MIN_FLUSH:
+                flushSuits[key] = suitBit
+    return flushSuits
+
+
+def buildRankTable(unsuitedKeys, unsuitedRanks):
+    rankSets = np.array(
+        [
+            ranks
+            for ranks in itertools.combinations_with_replacement(range(13), HAND_SIZE)
+            if max(ranks.count(rank) for rank in set(ranks)) <= 4
+        ],
+        dtype=np.int64,
+    )
+    best = np.full(len(rankSets), np.iinfo(np.uint16).max, dtype=np.uint16)
+    for combo in itertools.combinations(range(HAND_SIZE), 5):
+        keys = primeProducts(rankSets[:, combo])
+        best = np.minimum(best, lookupRanks(keys, unsuitedKeys, unsuitedRanks))
+
+    rankKeys = np.array(RANK_WEIGHTS, dtype=np.int64)[rankSets].sum(axis=1)
+    table = np.zeros(rankKeys.max() + 1, dtype=np.uint16)
+    table[rankKeys] = best
+    return table
+
+
+def buildFlushTable(flushKeys, flushRanks):
+    # 13 bit rank mask of the flush suit to the best flush in it
+    table = np.zeros(1 << 13, dtype=np.uint16)
+    for numCards in range(MIN_FLUSH, HAND_SIZE + 1):
+        for ranks in itertools.combinations(range(13), numCards):
+            fives = np.array(list(itertools.combinations(ranks, 5)))
+            best = lookupRanks(primeProducts(fives), flushKeys, flushRanks).min()
+            table[sum(1 << rank for rank in ranks)] = best
+    return table
+
+
+class HandEvaluator:
+    def __init__(self):
+        flushKeys, flushRanks, unsuitedKeys, unsuitedRanks = loadEvaluatorArrays()
+        self.cardCodes = buildCardCodes()
+        self.flushSuits = buildFlushSuits()
+        self.rankTable = buildRankTable(unsuitedKeys, unsuitedRanks)
+        self.flushTable = buildFlushTable(flushKeys, flushRanks)
+
+    def evaluate(self, cards):
+        # (N, 7) treys card ints to N treys ranks (uint16)
+        cards = np.ascontiguousarray(cards, dtype=np.int32)
+        ranks = np.empty(len(cards), dtype=np.uint16)
+        for start in range(0, len(cards), CHUNK_HANDS):
+            chunk = cards[start : start + CHUNK_HANDS]
+            ranks[start : start + len(chunk)] = self.evaluateChunk(chunk)
+        return ranks
+
+    def evaluateChunk(self, cards):
+        # byte 1 of every (little endian) card int, without copying
+        cardBytes = cards.view(np.uint8).reshape(len(cards), HAND_SIZE, 4)[:, :, 1]
+        keys = self.cardCodes.take(cardBytes[:, 0])
+        for i in range(1, HAND_SIZE):
+            keys += self.cardCodes.take(cardBytes[:, i])
+
+        ranks = self.rankTable.take(keys & RANK_KEY_MASK)
+        flushSuits = self.flushSuits.take(keys >> SUIT_SHIFT)
+        flushRows = np.flatnonzero(flushSuits)
+        if len(flushRows):
+            flushCards = cards[flushRows]
+            inSuit = ((flushCards >> 12) & 0xF) == flushSuits[flushRows, None]
+            rankMasks = np.bitwise_or.reduce(
+                np.where(inSuit, flushCards >> 16, 0), axis=1
+            )
+            ranks[flushRows] = self.flushTable.take(rankMasks)
+        return ranks
+
+    def evaluateHands(self, hands, board):
+        # every (2 card) hand on one 5 card board
+        hands = np.asarray(hands, dtype=np.int32).reshape(-1, 2)
+        cards = np.empty((len(hands), HAND_SIZE), dtype=np.int32)
+        cards[:, :2] = hands
+        cards[:, 2:] = board
+        return self.evaluate(cards)
+
+
+_handEvaluator = None
+
+
+def loadHandEvaluator():
+    global _handEvaluator
+
+    if _handEvaluator is None:
+        _handEvaluator = HandEvaluator()
+    return _handEvaluator
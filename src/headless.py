@@ -0,0 +1,283 @@
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from batch import decideBatch
+from constants import *
+from equity import ESTIMATOR_MODES
+from logic import *
+from resultstore import ResultsStore, ResultsWriter
+
+# * Headless (no UI) play, mostly for running bots against each other
+
+DEFAULT_LINEUP = [
+    NaiveBotPlayer,
+    ConservativeBotPlayer,
+    TurnerBotPlayer,
+    FishBotPlayer,
+    AdvancedBotPlayer,
+    StrategyBotPlayer,
+]
+
+
+@contextlib.contextmanager
+def quietOutput():
+    # the game logic prints every action, which is far too much for long runs
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def rebuy(game):
+    # start a fresh table once only one stack is left, so long runs keep going
+    for player in game.players:
+        player.chips = INITIAL_CHIPS
+    game.isFinished = False
+
+
+def playHeadless(
+    numHands, playerClasses=None, numSimulations=200, game=None, equityMode="plain"
+):
+    with quietOutput():
+        if game is None:
+            game = Game(playerClasses or DEFAULT_LINEUP, numSimulations, equityMode)
+
+        handsLeft = numHands
+        while handsLeft > 0:
+            handsLeft -= game.run(maxHands=handsLeft)
+            if game.isFinished:
+                rebuy(game)
+
+    return game
+
+
+def playRecorded(
+    numHands, writer, playerClasses=None, numSimulations=200, equityMode="plain"
+):
+    # like playHeadless, but writes every seat of every hand to a ResultsWriter
+    with quietOutput():
+        game = Game(playerClasses or DEFAULT_LINEUP, numSimulations, equityMode)
+        numSeats = len(game.players)
+
+        for hand in range(numHands):
+            # the blinds are already in, so count them back
+            chipsBefore = [player.chips + player.chipsInPot for player in game.players]
+            equities = np.full((numSeats, NUM_STREETS), np.nan, dtype=np.float32)
+
+            # step by hand so each street's win probabilities can be read
+            while game.handState != HAND_OVER:
+                for seat, player in enumerate(game.players):
+                    if not player.isFolded:
+                        equities[seat, game.stage] = player.winProbability
+                game.step()
+
+            writer.addHand(game.handsPlayed, game, chipsBefore, equities)
+            game.handsPlayed += 1
+            if game.isFinished:
+                rebuy(game)
+            game.resetGame()
+
+    return game
+
+
+def playMultiTable(
+    numTables,
+    numHands,
+    playerClasses=None,
+    numSimulations=200,
+    seed=None,
+    equityMode="plain",
+):
+    """
+    Plays numHands at each of numTables tables, deciding for all the waiting
+    batch bots (see batch.py) at once every time the tables pause
+    """
+    rng = np.random.default_rng(seed)
+    with quietOutput():
+        games = [
+            Game(playerClasses or DEFAULT_LINEUP, numSimulations, equityMode)
+            for _ in range(numTables)
+        ]
+        tables = []  # [game, hands left]
+        for game in games:
+            game.deferBatchDecisions = True
+            tables.append([game, numHands])
+
+        while tables:
+            waiting = []
+            for table in tables:
+                game = table[0]
+                table[1] -= game.run(maxHands=table[1])
+                if game.handState == HAND_WAITING:
+                    waiting.append(game)
+                elif game.isFinished:
+                    rebuy(game)
+
+            decideBatch(waiting, rng)
+            tables = [t for t in tables if t[0].handState == HAND_WAITING or t[1] > 0]
+
+    return games
+
+
+def playDeal(lineup, dealSeed, numSimulations=200, equityMode="plain"):
+    # one hand from fresh stacks: the chips each seat won or lost
+    dealRng = random.Random(dealSeed)
+
+    # each seat draws its decisions and simulations from its own stream, so
+    # whoever sits there rolls the same dice with the same cards (the first
+    # equities included, so the seats get their streams before the deal)
+    players = []
+    for seat, playerClass in enumerate(lineup):
+        player = playerClass(Deck())
+        player.rng = random.Random(f"{dealSeed}:{seat}")
+        players.append(player)
+
+    game = Game(
+        numSimulations=numSimulations,
+        equityMode=equityMode,
+        deckSeed=dealSeed,
+        players=players,
+        crnSeed=dealRng.getrandbits(32),
+    )
+    game.run(maxHands=1)
+    return [player.chips - INITIAL_CHIPS for player in game.players]
+
+
+def playDuplicate(
+    numDeals, playerClasses=None, numSimulations=200, seed=None, equityMode="plain"
+):
+    """
+    Duplicate poker: every deal is replayed once per seat with the lineup
+    rotated, so each bot gets every seat's cards and position once. A bot's
+    result for the deal is its average over the rotations, which cancels
+    much of the card luck. Returns a (numDeals, number of bots) array of
+    chips won per hand, in lineup order
+    """
+    lineup = list(playerClasses or DEFAULT_LINEUP)
+    numBots = len(lineup)
+    dealSeeds = np.random.default_rng(seed).integers(0, 2**32, numDeals)
+
+    results = np.zeros((numDeals, numBots))
+    with quietOutput():
+        for deal, dealSeed in enumerate(dealSeeds):
+            for rotation in range(numBots):
+                botIds = [(seat + rotation) % numBots for seat in range(numBots)]
+                chipsWon = playDeal(
+                    [lineup[botId] for botId in botIds],
+                    int(dealSeed),
+                    numSimulations,
+                    equityMode,
+                )
+                for botId, chips in zip(botIds, chipsWon):
+                    results[deal, botId] += chips
+    return results / numBots
+
+
+def playIndependent(
+    numHands, playerClasses=None, numSimulations=200, seed=None, equityMode="plain"
+):
+    # the same one-hand results as playDuplicate, each deal played only once
+    # with the bots in random seats
+    lineup = list(playerClasses or DEFAULT_LINEUP)
+    rng = np.random.default_rng(seed)
+
+    results = np.zeros((numHands, len(lineup)))
+    with quietOutput():
+        for hand, dealSeed in enumerate(rng.integers(0, 2**32, numHands)):
+            botIds = rng.permutation(len(lineup))
+            chipsWon = playDeal(
+                [lineup[botId] for botId in botIds],
+                int(dealSeed),
+                numSimulations,
+                equityMode,
+            )
+            results[hand, botIds] = chipsWon
+    return results
+
+
+def standardErrors(results):
+    # of each bot's mean chips won per row
+    return results.std(axis=0, ddof=1) / np.sqrt(len(results))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play bot-only hands without the UI")
+    parser.add_argument("--hands", type=int, default=1_000)
+    parser.add_argument("--simulations", type=int, default=200)
+    parser.add_argument("--tables", type=int, default=1)
+    parser.add_argument("--equity", choices=ESTIMATOR_MODES, default="plain")
+    parser.add_argument(
+        "--duplicate", action="store_true", help="replay each deal in every seat"
+    )
+    parser.add_argument("--results", help="directory to record every hand to")
+    args = parser.parse_args(argv)
+
+    if args.results:
+        startTime = time.perf_counter()
+        botNames = [bot.__name__ for bot in DEFAULT_LINEUP]
+        with ResultsWriter(args.results, botNames) as writer:
+            playRecorded(
+                args.hands,
+                writer,
+                numSimulations=args.simulations,
+                equityMode=args.equity,
+            )
+        elapsed = time.perf_counter() - startTime
+
+        store = ResultsStore(args.results)
+        print(f"Recorded {len(store)} rows in {elapsed:.1f}s to {args.results}")
+        for botName, summary in store.botSummary().items():
+            print(
+                f"{botName:>24}: {summary['chipsWon']:+8.1f} chips per hand, "
+                f"preflop equity {summary['preflopEquity']:.1f}%"
+            )
+        return
+
+    if args.duplicate:
+        startTime = time.perf_counter()
+        numDeals = max(args.hands // NUM_PLAYERS, 2)
+        results = playDuplicate(
+            numDeals, numSimulations=args.simulations, equityMode=args.equity
+        )
+        elapsed = time.perf_counter() - startTime
+
+        print(f"Played {numDeals} deals in every seat in {elapsed:.1f}s")
+        for bot, mean, error in zip(
+            DEFAULT_LINEUP, results.mean(axis=0), standardErrors(results)
+        ):
+            print(f"{bot.__name__:>24}: {mean:+8.1f} ± {error:.1f} chips per hand")
+        return
+
+    startTime = time.perf_counter()
+    if args.tables > 1:
+        games = playMultiTable(
+            args.tables,
+            args.hands,
+            numSimulations=args.simulations,
+            equityMode=args.equity,
+        )
+    else:
+        games = [
+            playHeadless(
+                args.hands, numSimulations=args.simulations, equityMode=args.equity
+            )
+        ]
+    elapsed = time.perf_counter() - startTime
+
+    for game in games:
+        print(f"Played {game.handsPlayed} hands in {elapsed:.1f}s")
+        for seat, player in enumerate(game.players):
+            stats = game.stats.summary(seat)
+            print(
+                f"{type(player).__name__:>24}: {player.chips:>6}  "
+                f"VPIP {stats['vpip']:.0%} PFR {stats['pfr']:.0%} "
+                f"AF {stats['af']:.1f} fold to bet {stats['foldToBet']:.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
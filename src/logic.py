@@ -1,26 +1,66 @@
-from treys import Card, Deck, Evaluator
+import copy
 
+from treys import Card, Deck
+
+from batch import *
+from buckets import handStrengthBucket
 from constants import *
+from equity import callDecision, estimateEquity
+from evaluatortables import loadEvaluator
+from metrics import METRICS
+from mcts import MCTSSearch
+from preflop import preflopEquityVsOne
+from scheduler import EquityScheduler
+from stats import OpponentStats
+from strategy import *
 
 # * Classes / Logic
 
 
 class Game:
-    def __init__(self):
-        self.deck = Deck()
-        self.evaluator = Evaluator()
+    def __init__(
+        self,
+        playerClasses=None,
+        numSimulations=5_000,
+        equityMode="plain",
+        deckSeed=None,
+        players=None,
+        blinds=(SMALL_BLIND_AMOUNT, BIG_BLIND_AMOUNT),
+        equityDeadline=None,
+        crnSeed=None,
+    ):
+        self.deck = Deck(deckSeed)  # a seed fixes the first hand's deal
+        self.numSimulations = numSimulations
+        self.equityMode = equityMode  # see equity.py
+        self.crnSeed = random.getrandbits(32) if crnSeed is None else crnSeed
+        self.evaluator = loadEvaluator()
+        self.smallBlindAmount, self.bigBlindAmount = blinds
+        # seconds the next actor's equity may take, None computes every seat
+        # up front (see scheduler.py)
+        self.equityScheduler = (
+            None if equityDeadline is None else EquityScheduler(equityDeadline)
+        )
 
-        botPlayers = [
-            NaiveBotPlayer(self.deck),
-            ConservativeBotPlayer(self.deck),
-            TurnerBotPlayer(self.deck),
-            FishBotPlayer(self.deck),
-            AdvancedBotPlayer(self.deck),
-        ]
+        if players is not None:
+            # players that already have chips (e.g. moved here in a tournament)
+            self.players = players
+            for player in players:
+                player.hand = self.deck.draw(NUM_PLAYER_CARDS)
+        elif playerClasses is None:
+            botPlayers = [
+                NaiveBotPlayer(self.deck),
+                ConservativeBotPlayer(self.deck),
+                TurnerBotPlayer(self.deck),
+                FishBotPlayer(self.deck),
+                AdvancedBotPlayer(self.deck),
+            ]
 
-        random.shuffle(botPlayers)
+            random.shuffle(botPlayers)
 
-        self.players = [Player(self.deck)] + botPlayers
+            self.players = [Player(self.deck)] + botPlayers
+        else:
+            # headless tables pass their own lineup (e.g. all bots)
+            self.players = [playerClass(self.deck) for playerClass in playerClasses]
 
         self.communityCards = []
         self.pot = 0
@@ -30,32 +70,73 @@ class Game:
         self.currentPlayerIndex = 0
         self.consecutiveCalls = 0
         self.sidePots = []  # tuples: (pot size, eligble players)
+        self.actionHistory = []  # this hand's (seat, action, amount, pot before)
         self.stage = 0
 
         self.isFinished = False
+        self.handState = HAND_BETTING
+        self.handsPlayed = 0
+        self.deferBatchDecisions = False  # see batch.py
+        self.resumingDecision = False
 
         self.smallBlindIndex = 0
         self.bigBlindIndex = 1
 
+        self.stats = OpponentStats(len(self.players))  # see stats.py
+        self.stats.startHand(self.players)
         self.postBlinds()
         self.updateAllPlayersPotOdds()
 
+        # bots act until the human is up (headless tables are driven by run())
+        if self.hasHumanPlayer():
+            self.nextPlayer()
+
+    def clone(self):
+        """
+        A copy to try actions on, e.g. for lookahead search. The evaluator, the
+        hands and the board are shared (they're replaced, never changed in
+        place), so only the seats, the deck order and the history are copied
+        """
+        game = Game.__new__(Game)
+        game.__dict__ = self.__dict__.copy()
+
+        game.players = [player.clone() for player in self.players]
+        game.deck = Deck.__new__(Deck)
+        game.deck.__dict__ = self.deck.__dict__.copy()
+        game.deck.cards = self.deck.cards[:]
+        game.actionHistory = self.actionHistory[:]
+        game.stats = None  # hypothetical actions shouldn't count
+        game.equityScheduler = None
+        if self.sidePots:
+            seatOf = {player: seat for seat, player in enumerate(self.players)}
+            game.sidePots = [
+                (potSize, [game.players[seatOf[p]] for p in eligiblePlayers])
+                for potSize, eligiblePlayers in self.sidePots
+            ]
+        return game
+
     def postBlinds(self):
         smallBlindPlayer = self.players[self.smallBlindIndex]
         bigBlindPlayer = self.players[self.bigBlindIndex]
 
-        smallBlindPlayer.bet(SMALL_BLIND_AMOUNT, self)
-        bigBlindPlayer.bet(BIG_BLIND_AMOUNT, self)
+        smallBlindPlayer.bet(self.smallBlindAmount, self)
+        bigBlindPlayer.bet(self.bigBlindAmount, self)
 
-        self.currentPlayerIndex = (self.bigBlindIndex) % NUM_PLAYERS
+        self.currentPlayerIndex = (self.bigBlindIndex) % len(self.players)
         print(self.currentPlayerIndex)
         # don't need to adjust current player since that is done elsewhere
 
-        self.nextPlayer()
-
     def rotateBlinds(self):
-        self.smallBlindIndex = (self.smallBlindIndex + 1) % NUM_PLAYERS
-        self.bigBlindIndex = (self.bigBlindIndex + 1) % NUM_PLAYERS
+        self.smallBlindIndex = (self.smallBlindIndex + 1) % len(self.players)
+        self.bigBlindIndex = (self.bigBlindIndex + 1) % len(self.players)
+
+    def seatPlayers(self, players):
+        # between hands only: a new lineup, e.g. after tournament table balancing
+        self.players = players
+        self.smallBlindIndex %= len(players)
+        self.bigBlindIndex = (self.smallBlindIndex + 1) % len(players)
+        self.stats = OpponentStats(len(players))  # they're kept by seat
+        self.isFinished = False
 
     def resetGame(self):
         self.deck = Deck()
@@ -70,33 +151,38 @@ class Game:
         self.currentPlayerIndex = 0
         self.consecutiveCalls = 0
         self.sidePots = []
-        self.updateAllPlayersPotOdds()
+        self.actionHistory = []
+        self.handState = HAND_BETTING
 
         for player in self.players:
             player.resetForNewRound()
             player.hand = self.deck.draw(NUM_PLAYER_CARDS)
-            player.isFolded = False
+            player.isFolded = player.chips <= 0  # busted players sit out
             player.isAllIn = False
+            player.chipsInPot = 0
 
+        if self.stats is not None:
+            self.stats.startHand(self.players)
         self.postBlinds()
+        self.updateAllPlayersPotOdds()
 
     def dealFlop(self):
         if self.stage == 0:
-            self.communityCards.extend(self.deck.draw(NUM_FLOP_CARDS))
+            # a new list rather than extend, since clones share the board
+            self.communityCards = self.communityCards + self.deck.draw(NUM_FLOP_CARDS)
             self.stage = 1
             self.updateAllPlayersPotOdds()
 
     def dealRiver(self):
         if self.stage == 1 or self.stage == 2:
-            self.communityCards.append(self.deck.draw(1)[0])
+            self.communityCards = self.communityCards + self.deck.draw(1)
             self.stage += 1
             self.updateAllPlayersPotOdds()
 
-    def addToPot(self, amount, player=None):  # player parameter is for all-inning
-        if player and player.isAllIn:
-            self.handleSidePot(amount, player)
-        else:
-            self.pot += amount
+    def addToPot(self, amount, player=None):
+        self.pot += amount
+        if player:
+            player.chipsInPot += amount
 
     def advanceStage(self):
         if self.stage == 0:
@@ -104,32 +190,33 @@ class Game:
         elif self.stage in [1, 2]:
             self.dealRiver()
 
-    def handleSidePot(self, amount, allInPlayer):
-        allInAmount = allInPlayer.chipsBetInRound
-        remainingAmount = amount
-
-        # adjust side pot and main pots based on all-in amount
-        for i, (pot, eligiblePlayers) in enumerate(self.sidePots):
-            if allInAmount >= pot:
-                allInAmount -= pot
-            else:
-                extraAmount = pot - allInAmount
-                self.sidePots[i] = (allInAmount, eligiblePlayers)
-                self.sidePots.append((extraAmount, eligiblePlayers))
-                remainingAmount -= allInAmount
+    def buildSidePots(self):
+        """
+        Splits the pot by how much each player put in, so an all-in player can
+        only win up to their own contribution from everyone else
+        """
+        sidePots = []
+        remaining = {player: player.chipsInPot for player in self.players}
+
+        while any(remaining.values()):
+            contenders = [
+                p for p in self.players if not p.isFolded and remaining[p] > 0
+            ]
+            if not contenders:
+                # only folded money is left, it goes to the last pot
+                amount, eligiblePlayers = sidePots[-1]
+                sidePots[-1] = (amount + sum(remaining.values()), eligiblePlayers)
                 break
 
-        # then main pot is adjusted
-        if allInAmount > 0:
-            remainingAmount -= allInAmount
-            self.sidePots.append(
-                (
-                    allInAmount,
-                    [p for p in self.players if not p.isFolded and p != allInPlayer],
-                )
-            )
+            level = min(remaining[p] for p in contenders)
+            potSize = 0
+            for player in self.players:
+                contribution = min(remaining[player], level)
+                remaining[player] -= contribution
+                potSize += contribution
+            sidePots.append((potSize, contenders))
 
-        self.pot += remainingAmount
+        return sidePots
 
     def updateRaise(self, totalRoundBet):
         if totalRoundBet > self.maxRaise:
@@ -139,74 +226,143 @@ class Game:
                 f"Raise updated: maxRaise = {self.maxRaise}, hasRaised = {self.hasRaised}"
             )
         self.hasRaised = True
-        self.addToPot(
-            totalRoundBet - self.players[self.currentPlayerIndex].chipsBetInRound
-        )
         self.consecutiveCalls = 0
         print(
             f"Raise complete: maxRaise = {self.maxRaise}, hasRaised = {self.hasRaised}, consecutiveCalls = {self.consecutiveCalls}"
         )
 
+    def recordAction(self, player, action, amount=0):
+        seat = self.players.index(player)
+        if self.stats is not None:
+            self.stats.record(
+                seat,
+                action,
+                amount,
+                self.maxRaise - player.chipsBetInRound,
+                self.stage == 0,
+                self.stage == 0 and len(self.actionHistory) < 2,  # the blinds
+            )
+        self.actionHistory.append((seat, action, amount, self.pot))
+
     def updateAllPlayersPotOdds(self):
+        if self.equityScheduler is not None:
+            # queued by who acts next, each worked out when it's needed
+            self.equityScheduler.schedule(self)
+            return
         for player in self.players:
             player.calculatePotOdds(self)
 
+    def isBot(self, player):
+        return hasattr(player, "botAction")
+
+    def isWaitingOnBatch(self, player):
+        return (
+            self.deferBatchDecisions
+            and hasattr(player, "batchPolicy")
+            and player.batchDecision is None
+        )
+
+    def hasHumanPlayer(self):
+        return any(not self.isBot(player) for player in self.players)
+
     def nextPlayer(self):
-        while True:
-            activePlayers = [p for p in self.players if not p.isFolded]
-            print(f"Active Players: {len(activePlayers)}")  # Debugging
-            if len(activePlayers) == 1:
-                self.determineWinner()
+        # called by the UI after the human acts; plays bots until it's their turn
+        self.run()
+
+    def run(self, maxHands=None):
+        """
+        Flat driver loop for the hand state machine. Each step() is a single
+        action, and a finished hand only sets HAND_OVER, so the next hand is
+        started from here instead of from inside determineWinner. The stack
+        depth stays the same no matter how many hands are played
+        """
+        handsPlayed = 0
+        if self.handState == HAND_WAITING:
+            self.handState = HAND_BETTING
+
+        while not self.isFinished:
+            if self.handState == HAND_OVER:
+                if maxHands is not None and handsPlayed >= maxHands:
+                    break
+                self.resetGame()
+
+            self.step()
+
+            if self.handState == HAND_WAITING:
                 break
+            if self.handState == HAND_OVER:
+                handsPlayed += 1
+                self.handsPlayed += 1
 
-            self.currentPlayerIndex = (self.currentPlayerIndex + 1) % NUM_PLAYERS
-            currentPlayer = self.players[self.currentPlayerIndex]
-            print(
-                f"Current Player Index: {self.currentPlayerIndex}, Folded: {currentPlayer.isFolded}"
-            )  # Debugging
-
-            if (
-                isinstance(
-                    currentPlayer,
-                    (
-                        NaiveBotPlayer,
-                        ConservativeBotPlayer,
-                        TurnerBotPlayer,
-                        FishBotPlayer,
-                        AdvancedBotPlayer,
-                    ),
-                )
-                and not currentPlayer.isFolded
-            ):
+        return handsPlayed
+
+    def step(self):
+        activePlayers = [p for p in self.players if not p.isFolded]
+        print(f"Active Players: {len(activePlayers)}")  # Debugging
+        if len(activePlayers) == 1:
+            self.determineWinner()
+            return
+
+        if self.resumingDecision:
+            self.resumingDecision = False  # the seat we paused on acts now
+        else:
+            self.currentPlayerIndex = (self.currentPlayerIndex + 1) % len(self.players)
+        currentPlayer = self.players[self.currentPlayerIndex]
+        print(
+            f"Current Player Index: {self.currentPlayerIndex}, Folded: {currentPlayer.isFolded}"
+        )  # Debugging
+
+        isActing = not (currentPlayer.isFolded or currentPlayer.isAllIn)
+        if isActing and self.equityScheduler is not None:
+            currentPlayer.calculatePotOdds(self)  # due now, the rest can wait
+
+        if not isActing:
+            pass  # nothing left for them to decide this hand
+        elif self.isWaitingOnBatch(currentPlayer):
+            # yield point: decided together with other tables (see batch.py)
+            self.resumingDecision = True
+            self.handState = HAND_WAITING
+            return
+        elif self.isBot(currentPlayer):
+            with METRICS.timed(f"bot {type(currentPlayer).__name__}"):
                 currentPlayer.botAction(self)
-                self.actionTaken = True
-            elif not currentPlayer.isFolded:
-                self.actionTaken = False
-                break
+            self.actionTaken = True
+        else:
+            # yield point: wait for the human to act through the UI
+            self.actionTaken = False
+            self.handState = HAND_WAITING
+            if self.equityScheduler is not None:
+                self.equityScheduler.prefetch(self)  # uses their think time
+            return
 
-            activeNonAllInPlayers = len(
-                [p for p in self.players if not p.isFolded and not p.isAllIn]
-            )
-            print(
-                f"Consecutive Calls: {self.consecutiveCalls}, Active Non-All-In Players: {activeNonAllInPlayers}"
-            )  # Debugging
+        if self.bettingIsClosed() or self.stage == 3:
+            if self.stage < 3:
+                self.resetRound()
+                self.advanceStage()
+            else:
+                self.determineWinner()
+                return
 
-            if self.consecutiveCalls >= activeNonAllInPlayers or self.stage == 3:
-                if self.stage < 3:
-                    self.resetRound()
-                    self.advanceStage()
-                else:
-                    self.determineWinner()
+        for player in self.players:
+            player.updateCheckOrCall(self)
 
-            for player in self.players:
-                player.updateCheckOrCall(self)
+    def bettingIsClosed(self):
+        playersToAct = [p for p in self.players if not p.isFolded and not p.isAllIn]
+        print(
+            f"Consecutive Calls: {self.consecutiveCalls}, Active Non-All-In Players: {len(playersToAct)}"
+        )  # Debugging
+
+        # nobody left to bet against, so there is no more action this round
+        if len(playersToAct) == 1 and playersToAct[0].chipsBetInRound >= self.maxRaise:
+            return True
+
+        return self.consecutiveCalls >= len(playersToAct)
 
     def resetRound(self):
         self.actionTaken = False
         self.hasRaised = False
         self.maxRaise = 0
         self.consecutiveCalls = 0
-        self.sidePots = []
         self.updateAllPlayersPotOdds()
         for player in self.players:
             player.resetForNewRound()
@@ -219,48 +375,54 @@ class Game:
         activePlayers = [p for p in self.players if not p.isFolded]
         if len(activePlayers) == 1:
             self.awardPot(activePlayers[0])
-
-            self.resetGame()
-            self.rotateBlinds()  # Rotate blinds after each round
+            self.endHand()
             return
 
         if self.stage != 3:  # only runs at end of game
             return
 
-        bestEvalScore = None
-        winningPlayer = None
-        for player in self.players:
-            if player.isFolded:
-                continue
-            handScore = self.evaluator.evaluate(player.hand, self.communityCards)
-            if bestEvalScore is None or handScore < bestEvalScore:
-                bestEvalScore = handScore
-                winningPlayer = player
-
-        if winningPlayer:
-            print(f"Winner detected with {bestEvalScore}")
-            self.awardPot(winningPlayer)
-            self.resetGame()
-            self.rotateBlinds()
+        handScores = {
+            player: self.evaluator.evaluate(player.hand, self.communityCards)
+            for player in self.players
+            if not player.isFolded
+        }
+        print(f"Winner detected with {min(handScores.values())}")
+
+        self.sidePots = self.buildSidePots()
+        for potSize, eligiblePlayers in self.sidePots:
+            bestScore = min(handScores[p] for p in eligiblePlayers)
+            winners = [p for p in eligiblePlayers if handScores[p] == bestScore]
+            self.splitPot(potSize, winners)
 
-    def awardPot(self, winningPlayer):
-        winningPlayer.chips += self.pot
         self.pot = 0
+        self.sidePots = []
+        self.checkIfFinished()
+        self.endHand()
 
-        # Award side pots
-        for pot, eligiblePlayers in self.sidePots:
-            if winningPlayer in eligiblePlayers:
-                winningPlayer.chips += pot
-            else:
-                distAmount = pot / len(eligiblePlayers)
-                for player in eligiblePlayers:
-                    player.chips += distAmount
+    def endHand(self):
+        # the driver loop in run() deals the next hand
+        self.rotateBlinds()  # Rotate blinds after each round
+        self.handState = HAND_OVER
 
-        # Reset the side pots
+    def awardPot(self, winningPlayer):
+        # everyone else folded, so the whole pot is theirs
+        winningPlayer.chips += self.pot
+        self.pot = 0
         self.sidePots = []
+        self.checkIfFinished()
 
-        if self.players[0].chips == 0:
+    def splitPot(self, potSize, winners):
+        # whole chips only, the odd chips go to the first winner
+        share, oddChips = divmod(potSize, len(winners))
+        for player in winners:
+            player.chips += share
+        winners[0].chips += oddChips
+
+    def checkIfFinished(self):
+        if not self.isBot(self.players[0]) and self.players[0].chips == 0:
             self.isFinished = True
+        elif len([p for p in self.players if p.chips > 0]) < 2:
+            self.isFinished = True  # headless tables end when one stack is left
 
 
 import random
@@ -273,18 +435,42 @@ class Player:
         self.chips = 1000
         self.isAllIn = False
         self.chipsBetInRound = 0
+        self.chipsInPot = 0  # everything put in this hand, for side pots
         self.checkOrCall = "Check"
 
         self.potOdds = float("inf")
         self.winProbability = 0
         self.worthCalling = False
-
-    def calculateWinningProbability(self, game, numSimulations=5_000):
-        wins = 0
-        knownCards = set(self.hand + game.communityCards)
-        numCommunityNeeded = NUM_COMMUNITY_CARDS - len(game.communityCards)
-
-        activePlayersCount = len(
+        self.batchDecision = None  # (action, amount) handed over by batch.py
+        self.rng = random  # duplicate play gives each bot its own stream
+
+    def restoreTransientState(self):
+        # rebuilds what a snapshot doesn't hold (see snapshot.py)
+        self.rng = random
+
+    def __getstate__(self):
+        # the random module itself can't be pickled, so it's put back on load
+        state = self.__dict__.copy()
+        if state.get("rng") is random:
+            del state["rng"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "rng" not in state:
+            self.rng = random
+
+    def clone(self):
+        # attributes are numbers, strings or shared on purpose (see Game.clone),
+        # except a seat's own rng: lookahead mustn't move the real seat's dice
+        player = self.__class__.__new__(self.__class__)
+        player.__dict__ = self.__dict__.copy()
+        if self.rng is not random:
+            player.rng = copy.copy(self.rng)
+        return player
+
+    def opponentsLeft(self, game):
+        return len(
             [
                 player
                 for player in game.players
@@ -292,40 +478,55 @@ class Player:
             ]
         )
 
-        for _ in range(numSimulations):
-            simDeck = Deck()
-            simDeck.cards = [card for card in simDeck.cards if card not in knownCards]
-
-            # simulate hands for active players
-            simHands = [
-                simDeck.draw(NUM_PLAYER_CARDS) for _ in range(activePlayersCount)
-            ]
-            simCommunity = game.communityCards + simDeck.draw(numCommunityNeeded)
-
-            myHandStrength = game.evaluator.evaluate(self.hand, simCommunity)
-            if all(
-                myHandStrength <= game.evaluator.evaluate(hand, simCommunity)
-                for hand in simHands
-            ):
-                wins += 1
-
-        return wins / numSimulations
+    def lookedUpEquity(self, game, activePlayersCount):
+        # equity that needs no simulation, or None
+        if game.stage == 0 and activePlayersCount == 1:
+            # heads-up preflop is a fixed number (see preflop.py)
+            return preflopEquityVsOne(self.hand)
+        return None
+
+    def equityRng(self, game, stage=None):
+        if game.equityMode == "crn":
+            # every seat draws from the same stream on a street (see equity.py)
+            stage = game.stage if stage is None else stage
+            return random.Random(game.crnSeed + game.handsPlayed * 4 + stage)
+        return self.rng
+
+    def calculateWinningProbability(self, game, numSimulations=None):
+        if numSimulations is None:
+            numSimulations = game.numSimulations
+
+        activePlayersCount = self.opponentsLeft(game)
+        equity = self.lookedUpEquity(game, activePlayersCount)
+        if equity is not None:
+            return equity
+
+        return estimateEquity(
+            self.hand,
+            game.communityCards,
+            activePlayersCount,
+            numSimulations,
+            game.evaluator,
+            game.equityMode,
+            self.equityRng(game),
+        )
 
     def calculatePotOdds(self, game):
         callAmount = game.maxRaise - self.chipsBetInRound
-        winProbability = self.calculateWinningProbability(game) * 100
-
-        if callAmount <= 0:
-            self.potOdds = float("inf")
-            self.winProbability = winProbability
-            self.worthCalling = True
-            return
+        with METRICS.timed("equity"):
+            if game.equityScheduler is not None:
+                winProbability = game.equityScheduler.equity(self, game) * 100
+            else:
+                winProbability = self.calculateWinningProbability(game) * 100
 
-        potOdds = game.pot / callAmount
-        worthCalling = winProbability > (1 / (1 + potOdds)) * 100
-        self.potOdds = potOdds
+        self.potOdds, self.worthCalling = callDecision(
+            winProbability, game.pot, callAmount
+        )
         self.winProbability = winProbability
-        self.worthCalling = worthCalling
+
+    def getHandStrengthBucket(self, game):
+        # 0 (weakest) to NUM_HAND_BUCKETS - 1, looked up instead of simulated
+        return handStrengthBucket(self.hand, game.communityCards)
 
     def evaluateHandStrength(self, communityCards=[]):
         fullHand = self.hand + communityCards
@@ -402,36 +603,102 @@ class Player:
 
     def allIn(self, game):
         allInAmount = self.chips
+        game.recordAction(self, "allin", allInAmount)
         self.chips = 0
         self.isAllIn = True
+        self.chipsBetInRound += allInAmount
         game.addToPot(allInAmount, self)
+        if self.chipsBetInRound > game.maxRaise:
+            game.updateRaise(self.chipsBetInRound)  # everyone else has to call it
         # https://favtutor.com/blogs/class-name-python
         # TODO: move outside of class or add identifier
         print(f"{self.__class__.__name__} goes All-In with ${allInAmount}")
 
+    def playTableAction(self, game, action):
+        # carries out one of the abstract actions from strategy.py
+        callAmount = game.maxRaise - self.chipsBetInRound
+
+        if action == ACTION_FOLD and callAmount > 0:
+            print("Folds")
+            self.fold(game)
+        elif action in RAISE_POT_FRACTIONS:
+            raiseAmount = int(
+                callAmount + RAISE_POT_FRACTIONS[action] * (game.pot + callAmount)
+            )
+            if raiseAmount >= self.chips:
+                print("All-In due to insufficient chips")
+                self.allIn(game)
+            else:
+                print(f"Raises ${raiseAmount}")
+                self.bet(raiseAmount, game)
+        elif action == ACTION_ALL_IN:
+            self.allIn(game)
+        elif callAmount == 0:
+            self.check(game)
+            return
+        else:
+            print("Calls")
+            self.call(game)
+
+        game.actionTaken = True
+
+    def playBatchDecision(self, game):
+        action, amount = self.batchDecision
+        self.batchDecision = None
+
+        if action == BATCH_CHECK:
+            self.check(game)
+        elif action == BATCH_CALL:
+            print("Calls")
+            self.call(game)
+        elif action == BATCH_RAISE:
+            print(f"Raises ${amount}")
+            self.bet(amount, game)
+        elif action == BATCH_ALL_IN:
+            print("All-In due to insufficient chips")
+            self.allIn(game)
+        else:
+            print("Folds")
+            self.fold(game)
+
+        game.actionTaken = True
+
     def resetForNewRound(self):
         self.chipsBetInRound = 0
 
-    def fold(self):
+    def check(self, game):
+        print("Checks")
+        game.consecutiveCalls += 1
+        game.recordAction(self, "check")
+
+    def fold(self, game):
         self.isFolded = True
+        game.recordAction(self, "fold")
         print("Human player folds")
 
     def bet(self, amount, game):
+        if amount <= 0:
+            # raising by nothing is just a check/call, and keeps the round moving
+            self.call(game)
+            return 0
+
         totalRoundBet = self.chipsBetInRound + amount
-        if amount > self.chips:
+        if amount >= self.chips:  # betting the whole stack is going all-in
             self.allIn(game)
         else:
+            game.recordAction(self, "bet", amount)
             self.chips -= amount
             self.chipsBetInRound += amount
-            game.addToPot(amount)
+            game.addToPot(amount, self)
             game.updateRaise(totalRoundBet)
             return amount
 
     def call(self, game):
         callAmount = game.maxRaise - self.chipsBetInRound
-        if self.chips >= callAmount:
+        if self.chips > callAmount or callAmount == 0:
+            game.recordAction(self, "call", callAmount)
             self.chips -= callAmount
-            game.addToPot(callAmount)
+            game.addToPot(callAmount, self)
             game.consecutiveCalls += 1
             print(f"Consecutive calls {game.consecutiveCalls}")
             self.chipsBetInRound += callAmount
@@ -445,15 +712,14 @@ class FishBotPlayer(Player):
         callAmount = game.maxRaise - self.chipsBetInRound
 
         if callAmount == 0:
-            print("Checks")
-            game.consecutiveCalls += 1
+            self.check(game)
             return
 
         # a fish is basically just a calling machine
-        action = random.choices(["raise", "call", "fold"], weights=[1, 4, 1])[0]
+        action = self.rng.choices(["raise", "call", "fold"], weights=[1, 4, 1])[0]
 
         if action == "raise":
-            raiseAmount = random.randint(1, self.chips)
+            raiseAmount = self.rng.randint(1, self.chips)
             print(f"Raises ${raiseAmount}")
             self.bet(raiseAmount, game)
         elif action == "call":
@@ -461,7 +727,7 @@ class FishBotPlayer(Player):
             self.call(game)
         else:
             print("Folds")
-            self.fold()
+            self.fold(game)
 
         game.actionTaken = True
 
@@ -472,15 +738,14 @@ class NaiveBotPlayer(Player):
 
         # checks if it is able to
         if callAmount == 0:
-            print("Checks")
-            game.consecutiveCalls += 1
+            self.check(game)
             return
 
         # weighted choice between raising caling and folding, with a weight against raising
-        action = random.choices(["raise", "call", "fold"], weights=[1, 3, 2])[0]
+        action = self.rng.choices(["raise", "call", "fold"], weights=[1, 3, 2])[0]
 
         if action == "raise":
-            raiseAmount = random.randint(1, self.chips)
+            raiseAmount = self.rng.randint(1, self.chips)
             print(f"Raises ${raiseAmount}")
             self.bet(raiseAmount, game)
         elif action == "call":
@@ -488,7 +753,7 @@ class NaiveBotPlayer(Player):
             self.call(game)
         else:
             print("Folds")
-            self.fold()
+            self.fold(game)
 
         game.actionTaken = True
 
@@ -516,7 +781,7 @@ class TurnerBotPlayer(Player):
             self.allIn(game)
         else:
             print("Turner Folds")
-            self.fold()
+            self.fold(game)
 
         game.actionTaken = True
 
@@ -527,7 +792,13 @@ class TurnerBotPlayer(Player):
 
 
 class ConservativeBotPlayer(Player):
+    batchPolicy = "conservative"
+
     def botAction(self, game):
+        if self.batchDecision is not None:
+            self.playBatchDecision(game)
+            return
+
         self.updateCheckOrCall(game)
         self.calculatePotOdds(game)
 
@@ -547,8 +818,7 @@ class ConservativeBotPlayer(Player):
 
         if callAmount == 0:
             if ev < conservativeCheckThreshold:
-                print("Checks")
-                game.consecutiveCalls += 1
+                self.check(game)
                 return
 
         if ev > conservativeRaiseThreshold:
@@ -565,22 +835,29 @@ class ConservativeBotPlayer(Player):
             self.call(game)
         else:
             print("Folds")
-            self.fold()
+            self.fold(game)
 
         game.actionTaken = True
 
 
 class AdvancedBotPlayer(Player):
+    batchPolicy = "advanced"
+
     def botAction(self, game):
+        if self.batchDecision is not None:
+            self.playBatchDecision(game)
+            return
+
         self.updateCheckOrCall(game)
         self.calculatePotOdds(game)
 
         # position relative to button
-        position = (game.currentPlayerIndex - game.bigBlindIndex) % NUM_PLAYERS
+        numSeats = len(game.players)
+        position = (game.currentPlayerIndex - game.bigBlindIndex) % numSeats
 
         positionFactor = (
-            NUM_PLAYERS - position
-        ) / NUM_PLAYERS  # More aggressive in later positions
+            numSeats - position
+        ) / numSeats  # More aggressive in later positions
 
         callAmount = game.maxRaise - self.chipsBetInRound
         potSize = game.pot + callAmount
@@ -591,8 +868,7 @@ class AdvancedBotPlayer(Player):
 
         if callAmount == 0:
             if adjustedEV < 10 * positionFactor:
-                print("Checks")
-                game.consecutiveCalls += 1
+                self.check(game)
                 return
 
         if adjustedEV > 0:
@@ -601,7 +877,7 @@ class AdvancedBotPlayer(Player):
                 self.allIn(game)
             elif self.chips > 2 * callAmount:
                 raiseAmount = int(
-                    min(callAmount + random.uniform(1, self.chips / 4), self.chips)
+                    min(callAmount + self.rng.uniform(1, self.chips / 4), self.chips)
                 )
                 print(f"Raises ${raiseAmount}")
                 self.bet(raiseAmount, game)
@@ -615,6 +891,59 @@ class AdvancedBotPlayer(Player):
             self.call(game)
         else:
             print("Folds")
-            self.fold()
+            self.fold(game)
 
         game.actionTaken = True
+
+
+"""
+Looks its action up in a table solved offline (see solver.py) instead of
+running its own simulations, so deciding is just a few integer operations.
+It uses the win probability the game already computed for this street
+"""
+
+
+class StrategyBotPlayer(Player):
+    def botAction(self, game):
+        self.updateCheckOrCall(game)
+
+        position = (game.currentPlayerIndex - game.bigBlindIndex) % len(game.players)
+        callAmount = game.maxRaise - self.chipsBetInRound
+
+        action = loadStrategyTable().lookup(
+            game.stage,
+            position,
+            potOddsBucket(callAmount, game.pot),
+            strengthBucket(self.winProbability),
+        )
+
+        self.playTableAction(game, action)
+
+
+"""
+Searches the rest of the hand with Monte Carlo tree search (see mcts.py)
+for a fixed amount of time each decision, keeping the part of the tree
+under what actually got played for its next decision in the same hand
+"""
+
+
+class MCTSBotPlayer(Player):
+    timeBudget = MCTS_TIME_BUDGET
+
+    def __init__(self, deck):
+        super().__init__(deck)
+        self.search = MCTSSearch(self.timeBudget)
+
+    def restoreTransientState(self):
+        super().restoreTransientState()
+        self.search = MCTSSearch(self.timeBudget)  # the old tree isn't saved
+
+    def clone(self):
+        player = super().clone()
+        player.search = MCTSSearch(self.timeBudget)  # lookahead keeps its own tree
+        return player
+
+    def botAction(self, game):
+        self.updateCheckOrCall(game)
+        action = self.search.chooseAction(game, self)
+        self.playTableAction(game, action)
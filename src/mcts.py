@@ -0,0 +1,351 @@
+import math
+import random
+import time
+
+from treys import Deck
+
+from constants import *
+from metrics import METRICS
+from strategy import ACTION_ALL_IN, ACTION_CALL, ACTION_FOLD, RAISE_POT_FRACTIONS
+
+# * Monte Carlo tree search over the betting actions of a hand
+
+"""
+The tree is keyed by betting actions only. Cards are "determinized": every
+playout deals the unknown cards (opponent hands and the rest of the board)
+at random, so the same tree collects statistics over many possible deals.
+Since the betting is the same no matter which cards come, an action path
+always leads to the same seat being up, which is what makes this work.
+
+Bet sizes are abstracted to the same actions the strategy table uses
+(check/call, half pot, pot, all-in), and the model of the betting round is
+simpler than Game's: a round closes once everyone has acted since the last
+raise
+"""
+
+EXPLORATION = 0.7
+HISTORY_ACTIONS = {"check": ACTION_CALL, "call": ACTION_CALL, "fold": ACTION_FOLD}
+
+
+class Node:
+    __slots__ = ("children", "visits", "totalReward")
+
+    def __init__(self):
+        self.children = {}
+        self.visits = 0
+        self.totalReward = 0.0  # for the seat that took the action into here
+
+
+class SearchState:
+    __slots__ = (
+        "chips",
+        "roundBets",
+        "inPot",
+        "folded",
+        "allIn",
+        "pot",
+        "maxRaise",
+        "stage",
+        "board",
+        "hands",
+        "deck",
+        "toAct",
+        "pending",
+        "firstSeat",
+    )
+
+    @staticmethod
+    def fromGame(game, searchPlayer):
+        state = SearchState()
+        players = game.players
+        state.chips = [p.chips for p in players]
+        state.roundBets = [p.chipsBetInRound for p in players]
+        state.inPot = [p.chipsInPot for p in players]
+        state.folded = [p.isFolded for p in players]
+        state.allIn = [p.isAllIn for p in players]
+        state.pot = game.pot
+        state.maxRaise = game.maxRaise
+        state.stage = game.stage
+        state.board = list(game.communityCards)
+        state.hands = [None] * len(players)
+        state.hands[players.index(searchPlayer)] = list(searchPlayer.hand)
+        state.deck = []
+        state.toAct = game.currentPlayerIndex
+        state.firstSeat = game.smallBlindIndex
+
+        # we don't know who has already acted this round, so assume everyone
+        # still gets one more turn after us
+        state.pending = [state.toAct] + [
+            seat for seat in state.seatsAfter(state.toAct) if state.canAct(seat)
+        ]
+        return state
+
+    def copy(self):
+        state = SearchState()
+        state.chips = self.chips[:]
+        state.roundBets = self.roundBets[:]
+        state.inPot = self.inPot[:]
+        state.folded = self.folded[:]
+        state.allIn = self.allIn[:]
+        state.pot = self.pot
+        state.maxRaise = self.maxRaise
+        state.stage = self.stage
+        state.board = self.board[:]
+        state.hands = self.hands[:]
+        state.deck = self.deck
+        state.toAct = self.toAct
+        state.pending = self.pending[:]
+        state.firstSeat = self.firstSeat
+        return state
+
+    def determinize(self, rng):
+        known = set(self.board)
+        for hand in self.hands:
+            if hand:
+                known.update(hand)
+
+        unknown = [card for card in Deck.GetFullDeck() if card not in known]
+        rng.shuffle(unknown)
+
+        for seat, hand in enumerate(self.hands):
+            if hand is None and not self.folded[seat]:
+                self.hands[seat] = [unknown.pop(), unknown.pop()]
+        self.deck = unknown
+
+    def seatsAfter(self, seat):
+        numSeats = len(self.chips)
+        return [(seat + offset) % numSeats for offset in range(1, numSeats)]
+
+    def canAct(self, seat):
+        return not self.folded[seat] and not self.allIn[seat]
+
+    def isTerminal(self):
+        return self.toAct is None
+
+    def legalActions(self):
+        seat = self.toAct
+        callAmount = self.maxRaise - self.roundBets[seat]
+        actions = [ACTION_CALL]
+        if callAmount > 0:
+            actions.append(ACTION_FOLD)
+
+        # raising only makes sense if someone can still call it
+        if any(self.canAct(other) for other in self.seatsAfter(seat)):
+            for action, potFraction in RAISE_POT_FRACTIONS.items():
+                if self.raiseAmount(potFraction) < self.chips[seat]:
+                    actions.append(action)
+            if self.chips[seat] > callAmount:
+                actions.append(ACTION_ALL_IN)
+
+        return actions
+
+    def raiseAmount(self, potFraction):
+        callAmount = self.maxRaise - self.roundBets[self.toAct]
+        return int(callAmount + potFraction * (self.pot + callAmount))
+
+    def apply(self, action):
+        seat = self.toAct
+        self.pending.remove(seat)
+
+        if action == ACTION_FOLD:
+            self.folded[seat] = True
+        elif action == ACTION_CALL:
+            self.pay(seat, min(self.maxRaise - self.roundBets[seat], self.chips[seat]))
+        elif action == ACTION_ALL_IN:
+            self.pay(seat, self.chips[seat])
+        else:
+            self.pay(seat, self.raiseAmount(RAISE_POT_FRACTIONS[action]))
+
+        if self.roundBets[seat] > self.maxRaise:
+            # a raise reopens the action for everyone else
+            self.maxRaise = self.roundBets[seat]
+            self.pending = [s for s in self.seatsAfter(seat) if self.canAct(s)]
+
+        if self.folded.count(False) == 1:
+            self.toAct = None
+        elif self.pending:
+            self.toAct = self.pending[0]
+        else:
+            self.nextStreet()
+
+    def pay(self, seat, amount):
+        self.chips[seat] -= amount
+        self.roundBets[seat] += amount
+        self.inPot[seat] += amount
+        self.pot += amount
+        if self.chips[seat] == 0:
+            self.allIn[seat] = True
+
+    def nextStreet(self):
+        playersToAct = [s for s in range(len(self.chips)) if self.canAct(s)]
+        if self.stage == 3 or len(playersToAct) < 2:
+            self.dealBoard(NUM_COMMUNITY_CARDS - len(self.board))
+            self.toAct = None
+            return
+
+        self.dealBoard(NUM_FLOP_CARDS if self.stage == 0 else 1)
+        self.stage += 1
+        self.maxRaise = 0
+        self.roundBets = [0] * len(self.chips)
+
+        seats = [self.firstSeat] + self.seatsAfter(self.firstSeat)
+        self.pending = [s for s in seats if self.canAct(s)]
+        self.toAct = self.pending[0]
+
+    def dealBoard(self, numCards):
+        if numCards > 0:
+            self.board = self.board + self.deck[-numCards:]
+            self.deck = self.deck[:-numCards]
+
+    def payoffs(self, evaluator):
+        # chips won or lost by each seat from this state's pot
+        winnings = [-amount for amount in self.inPot]
+        live = [s for s in range(len(self.chips)) if not self.folded[s]]
+
+        if len(live) == 1:
+            winnings[live[0]] += self.pot
+            return winnings
+
+        scores = {s: evaluator.evaluate(self.hands[s], self.board) for s in live}
+        remaining = self.inPot[:]
+        winners = live
+        while any(remaining):
+            contenders = [s for s in live if remaining[s] > 0]
+            if contenders:
+                level = min(remaining[s] for s in contenders)
+                bestScore = min(scores[s] for s in contenders)
+                winners = [s for s in contenders if scores[s] == bestScore]
+            else:
+                level = max(remaining)  # folded money left over
+
+            potSize = 0
+            for s in range(len(remaining)):
+                contribution = min(remaining[s], level)
+                remaining[s] -= contribution
+                potSize += contribution
+            for s in winners:
+                winnings[s] += potSize / len(winners)
+
+        return winnings
+
+
+def playoutAction(state, rng):
+    # cheap default policy: mostly check/call, sometimes fold or bet
+    actions = state.legalActions()
+    weights = [
+        4 if a == ACTION_CALL else 1 if a == ACTION_FOLD else 0.5 for a in actions
+    ]
+    return rng.choices(actions, weights)[0]
+
+
+class MCTSSearch:
+    def __init__(self, timeBudget=MCTS_TIME_BUDGET, seed=None):
+        self.timeBudget = timeBudget
+        self.rng = random.Random(seed)
+
+        self.root = None
+        self.rootHand = None
+        self.rootHistoryLength = 0
+        self.lastPlayouts = 0
+        self.lastElapsed = 0.0
+
+    def reuseTree(self, game):
+        """
+        Walks the old tree down the actions that were actually played since
+        our last decision, so the statistics under them carry over
+        """
+        if self.root is None or self.rootHand != game.handsPlayed:
+            return None
+        if len(game.actionHistory) < self.rootHistoryLength:
+            return None
+
+        node = self.root
+        for seat, action, amount, potBefore in game.actionHistory[
+            self.rootHistoryLength :
+        ]:
+            node = node.children.get(self.abstractAction(action, amount, potBefore))
+            if node is None:
+                return None
+        return node
+
+    def abstractAction(self, action, amount, potBefore):
+        if action in HISTORY_ACTIONS:
+            return HISTORY_ACTIONS[action]
+        if action == "allin":
+            return ACTION_ALL_IN
+
+        # closest bet size we model
+        return min(
+            RAISE_POT_FRACTIONS,
+            key=lambda a: abs(amount - RAISE_POT_FRACTIONS[a] * max(potBefore, 1)),
+        )
+
+    def chooseAction(self, game, player):
+        startTime = time.perf_counter()
+        rootState = SearchState.fromGame(game, player)
+        root = self.reuseTree(game) or Node()
+
+        scale = max(sum(rootState.chips) + rootState.pot, 1)
+        playouts = 0
+
+        while time.perf_counter() - startTime < self.timeBudget:
+            self.playout(root, rootState, game.evaluator, scale)
+            playouts += 1
+
+        legal = rootState.legalActions()
+        bestAction = max(
+            legal,
+            key=lambda a: root.children[a].visits if a in root.children else -1,
+        )
+
+        self.root = root
+        self.rootHand = game.handsPlayed
+        self.rootHistoryLength = len(game.actionHistory)
+        self.lastPlayouts = playouts
+        self.lastElapsed = time.perf_counter() - startTime
+        METRICS.record("mcts search", self.lastElapsed)
+        return bestAction
+
+    def playout(self, root, rootState, evaluator, scale):
+        state = rootState.copy()
+        state.determinize(self.rng)
+
+        node = root
+        path = []
+
+        # selection and expansion
+        while not state.isTerminal():
+            seat = state.toAct
+            actions = state.legalActions()
+            untried = [a for a in actions if a not in node.children]
+            if untried:
+                action = self.rng.choice(untried)
+                node.children[action] = Node()
+            else:
+                action = self.selectAction(node, actions)
+
+            node = node.children[action]
+            path.append((node, seat))
+            state.apply(action)
+            if untried:
+                break
+
+        # random rollout to the end of the hand
+        while not state.isTerminal():
+            state.apply(playoutAction(state, self.rng))
+
+        payoffs = state.payoffs(evaluator)
+        root.visits += 1
+        for node, seat in path:
+            node.visits += 1
+            node.totalReward += payoffs[seat] / scale
+
+    def selectAction(self, node, actions):
+        logVisits = math.log(node.visits + 1)
+
+        def ucb(action):
+            child = node.children[action]
+            average = child.totalReward / child.visits
+            return average + EXPLORATION * math.sqrt(logVisits / child.visits)
+
+        return max(actions, key=ucb)
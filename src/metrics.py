@@ -0,0 +1,58 @@
+import collections
+import contextlib
+import time
+
+# * Lightweight timing registry, shown by the in-game overlay (press M)
+
+WINDOW_SIZE = 200  # timings kept per metric
+
+
+class MetricsRegistry:
+    def __init__(self, windowSize=WINDOW_SIZE):
+        self.windowSize = windowSize
+        self.timings = {}  # name: deque of (finished at, seconds)
+        self.gauges = {}  # name: function returning the current value
+
+    def record(self, name, seconds):
+        if name not in self.timings:
+            self.timings[name] = collections.deque(maxlen=self.windowSize)
+        self.timings[name].append((time.perf_counter(), seconds))
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - startTime)
+
+    def addGauge(self, name, valueFn):
+        self.gauges[name] = valueFn
+
+    def last(self, name):
+        samples = self.timings.get(name)
+        return samples[-1][1] if samples else 0.0
+
+    def percentile(self, name, fraction):
+        samples = self.timings.get(name)
+        if not samples:
+            return 0.0
+        ordered = sorted(seconds for _, seconds in samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def rate(self, name):
+        # events per second over the window
+        samples = self.timings.get(name)
+        if not samples or len(samples) < 2:
+            return 0.0
+        elapsed = samples[-1][0] - samples[0][0]
+        return (len(samples) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def names(self, prefix=""):
+        return sorted(name for name in self.timings if name.startswith(prefix))
+
+    def reset(self):
+        self.timings.clear()
+
+
+METRICS = MetricsRegistry()
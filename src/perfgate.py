@@ -0,0 +1,237 @@
+import argparse
+import json
+import pathlib
+import random
+import statistics
+import sys
+import time
+
+from constants import *
+from headless import DEFAULT_LINEUP, playHeadless, quietOutput, rebuy
+from logic import *
+
+# * Performance regression gate, run with: python src/perfgate.py
+
+"""
+Runs a fixed, seeded workload and compares every timing with the baseline
+checked in next to this file (perfbaseline.json). Each metric there has a
+value in seconds and a tolerance: a run more than tolerance * value slower
+than the baseline is a regression, and any regression makes the exit code
+1, so it can sit in front of a commit or in CI. Every metric is printed
+with its change from the baseline either way.
+
+The workload is
+
+  - equity: one seat's Monte Carlo equity at each street of a seeded deal
+  - hands: full bot-only hands at a seeded table
+  - redraw: the game screen's scene drawn without a window, after every
+    action of a seeded bot hand and again with nothing changed
+
+Timings are a best of a few repeats (or a median over frames), which is
+steadier than a mean on a busy machine, but still only compare with a
+baseline taken on the same machine: after a change that's meant to move
+the numbers, or on a new machine, rerun with --update. Run it from the
+repo root, like main.py, so the game screen finds background.jpg
+"""
+
+BASELINE_FILE = pathlib.Path(__file__).parent / "perfbaseline.json"
+DEFAULT_TOLERANCE = 0.5  # for metrics that aren't in the baseline yet
+SEED = 112
+REPEATS = 3
+
+EQUITY_SIMULATIONS = 2_000
+HAND_SIMULATIONS = 200
+NUM_HANDS = 20
+NUM_FRAMES = 60
+STREET_NAMES = ("preflop", "flop", "turn", "river")
+STREET_CARDS = (0, NUM_FLOP_CARDS, 1, 1)  # board cards dealt at each street
+
+
+def bestOf(fn, repeats=REPEATS):
+    times = []
+    for _ in range(repeats):
+        startTime = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - startTime)
+    return min(times)
+
+
+def equityWorkload():
+    # seconds for one seat's equity on each street, five opponents
+    random.seed(SEED)
+    with quietOutput():
+        game = Game(DEFAULT_LINEUP, EQUITY_SIMULATIONS, deckSeed=SEED)
+    player = game.players[0]
+
+    results = {}
+    for street, numCards in zip(STREET_NAMES, STREET_CARDS):
+        game.communityCards = game.communityCards + game.deck.draw(numCards)
+        game.stage = STREET_NAMES.index(street)
+        results[f"equity {street}Seconds"] = bestOf(
+            lambda: player.calculateWinningProbability(game)
+        )
+    return results
+
+
+def handsWorkload():
+    # seconds per full bot-only hand, equity included
+    def playHands():
+        random.seed(SEED)
+        with quietOutput():
+            game = Game(DEFAULT_LINEUP, HAND_SIMULATIONS, deckSeed=SEED)
+        playHeadless(NUM_HANDS, game=game)
+
+    return {"hands handSeconds": bestOf(playHands) / NUM_HANDS}
+
+
+def redrawWorkload():
+    # seconds per game screen redraw, without opening a window
+    import atexit
+
+    import cmu_graphics
+    from PIL import Image
+
+    from scene import TableScene
+
+    # the scene creates shapes without ever running the app, which would
+    # make cmu_graphics print its "add cmu_graphics.run()" banner on exit
+    atexit.unregister(cmu_graphics.cmu_graphics.check_for_exit_without_run)
+
+    # the parts of graphics.setupGame that the scene reads
+    random.seed(SEED)
+    app = cmu_graphics.app
+    app.padding = 20
+    app.buttonWidth = 80
+    app.buttonHeight = 40
+    app.checkButtonLocation = (660, 820)
+    app.raiseButtonLocation = (760, 820)
+    app.foldButtonLocation = (860, 820)
+    app.toggleButtonLocation = (760, 880)
+    app.showOtherPlayersCards = False
+    app.showMetrics = False
+    app.betAmountStr = ""
+    app.image = cmu_graphics.CMUImage(
+        Image.open("background.jpg").resize((1200, 1000))
+    )
+    with quietOutput():
+        app.game = Game(DEFAULT_LINEUP, HAND_SIMULATIONS, deckSeed=SEED)
+    app.scene = TableScene(app)
+    game = app.game
+
+    def redraw():
+        # what cmu_graphics does for every redraw, minus putting it on screen
+        startTime = time.perf_counter()
+        app.group.clear()
+        app.scene.draw(app)
+        return time.perf_counter() - startTime
+
+    changed = []
+    idle = []
+    for _ in range(NUM_FRAMES):
+        with quietOutput():
+            if game.isFinished:
+                rebuy(game)
+            if game.handState == HAND_OVER:
+                game.resetGame()
+            game.step()
+        changed.append(redraw())
+        idle.append(redraw())
+
+    return {
+        "redraw actionSeconds": statistics.median(changed),
+        "redraw idleSeconds": statistics.median(idle),
+    }
+
+
+WORKLOADS = {
+    "equity": equityWorkload,
+    "hands": handsWorkload,
+    "redraw": redrawWorkload,
+}
+
+
+def runWorkloads(names=None):
+    results = {}
+    for name in names or WORKLOADS:
+        results.update(WORKLOADS[name]())
+    return results
+
+
+def loadBaseline(path=BASELINE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)["metrics"]
+    except FileNotFoundError:
+        return {}
+
+
+def saveBaseline(results, baseline, path=BASELINE_FILE):
+    # keeps the tolerance of every metric that's already there, and the
+    # metrics of workloads that weren't run
+    metrics = dict(baseline)
+    for metric, value in results.items():
+        tolerance = baseline.get(metric, {}).get("tolerance", DEFAULT_TOLERANCE)
+        metrics[metric] = {"value": value, "tolerance": tolerance}
+    with open(path, "w") as f:
+        json.dump({"seed": SEED, "metrics": metrics}, f, indent=2)
+        f.write("\n")
+
+
+def compare(results, baseline):
+    # (metric, measured, baseline value, relative change, is regression)
+    rows = []
+    for metric, value in results.items():
+        if metric not in baseline:
+            rows.append((metric, value, None, None, False))
+            continue
+        expected = baseline[metric]["value"]
+        change = value / expected - 1 if expected > 0 else 0.0
+        rows.append(
+            (metric, value, expected, change, change > baseline[metric]["tolerance"])
+        )
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check for performance regressions")
+    parser.add_argument("names", nargs="*", help=f"any of {', '.join(WORKLOADS)}")
+    parser.add_argument(
+        "--update", action="store_true", help="save this run as the baseline"
+    )
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args(argv)
+
+    for name in args.names:
+        if name not in WORKLOADS:
+            parser.error(f"unknown workload {name}")
+
+    results = runWorkloads(args.names)
+    baseline = loadBaseline(args.baseline)
+    rows = compare(results, baseline)
+
+    regressions = 0
+    for metric, value, expected, change, isRegression in rows:
+        if expected is None:
+            print(f"  {metric}: {value * 1000:.3f} ms (no baseline)")
+            continue
+        tolerance = baseline[metric]["tolerance"]
+        status = "REGRESSION" if isRegression else "ok"
+        print(
+            f"  {metric}: {value * 1000:.3f} ms vs {expected * 1000:.3f} ms "
+            f"({change:+.1%}, limit +{tolerance:.0%}) {status}"
+        )
+        regressions += isRegression
+
+    if args.update:
+        saveBaseline(results, baseline, args.baseline)
+        print(f"saved baseline to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"{regressions} metric(s) regressed")
+        return 1
+    print("no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,192 @@
+import argparse
+import itertools
+import math
+import random
+import sys
+import time
+
+import numpy as np
+from treys import Deck
+
+from cache import atomicWrite, cachePath
+from constants import *
+from handeval import loadHandEvaluator
+
+# * Preflop hand-vs-hand equity, looked up instead of simulated
+
+"""
+Every pair of hole cards has an index 0 to 1325 (from their positions in
+the full deck), and the matrix holds, for every hero and villain holding
+that don't share a card, the chance the hero ends up at least as good as
+the villain (ties count as wins, like estimateEquity) once five board
+cards are dealt. It's stored as uint16 (equity * 65535, 0 where the hands
+overlap) in a single .npy file, 3.5 MB, which is memory-mapped on load so
+only the rows that get looked up are read.
+
+The offline build (python preflop.py) deals random boards and ranks all
+1326 hands on each one in a single batch (see handeval.py), so every
+board is a sample for every matchup that doesn't collide with it. The
+totals are then averaged over the 24 suit relabelings, which makes
+suit-isomorphic matchups (AsKs vs QhQd and AhKh vs QsQc) come out
+identical and pools their samples.
+
+A player never sees the villain's cards, so heads-up preflop equity is a
+row average over every villain holding that doesn't overlap the hero's
+"""
+
+EQUITY_FILE = "preflop_equity.npy"
+EQUITY_SCALE = 65535
+BUILD_BOARDS = 20_000
+
+FULL_DECK = Deck.GetFullDeck()
+DECK_INDEX = {card: i for i, card in enumerate(FULL_DECK)}
+DECK_CARDS = np.array(FULL_DECK, dtype=np.int32)
+NUM_HANDS = math.comb(len(FULL_DECK), NUM_PLAYER_CARDS)  # 1326
+VILLAIN_HANDS = math.comb(len(FULL_DECK) - NUM_PLAYER_CARDS, NUM_PLAYER_CARDS)
+
+# deck indexes (low, high) of every hand, in order of handIndex
+HAND_CARDS = np.array(
+    list(itertools.combinations(range(len(FULL_DECK)), NUM_PLAYER_CARDS)),
+    dtype=np.int16,
+)
+HAND_CARDS = HAND_CARDS[np.lexsort((HAND_CARDS[:, 0], HAND_CARDS[:, 1]))]
+
+
+def handIndex(hand):
+    low, high = sorted(DECK_INDEX[card] for card in hand)
+    return low + high * (high - 1) // 2
+
+
+def overlapMask():
+    # (1326, 1326) True where two hands share a card
+    low, high = HAND_CARDS[:, :1], HAND_CARDS[:, 1:]
+    return (low == low.T) | (low == high.T) | (high == low.T) | (high == high.T)
+
+
+OVERLAP_MASK = overlapMask()  # about 10 ms and 1.7 MB
+
+
+def suitPermutations():
+    # hand index permutations for every relabeling of the four suits
+    suits = [DECK_INDEX[card] % 4 for card in FULL_DECK]  # full deck is rank-major
+    permutations = []
+    for order in itertools.permutations(range(4)):
+        cardMap = np.array(
+            [index - suits[index] + order[suits[index]] for index in range(52)]
+        )
+        low, high = np.sort(cardMap[HAND_CARDS], axis=1).T
+        permutations.append(low + high * (high - 1) // 2)
+    return permutations
+
+
+def boardRanks(board, evaluator):
+    # rank of every hand on a five card board, 0 for hands that collide with it
+    boardIndexes = [DECK_INDEX[card] for card in board]
+    live = ~np.isin(HAND_CARDS, boardIndexes).any(axis=1)
+    ranks = np.zeros(NUM_HANDS, dtype=np.int32)
+    ranks[live] = evaluator.evaluateHands(DECK_CARDS[HAND_CARDS[live]], board)
+    return ranks
+
+
+def buildEquityMatrix(numBoards=BUILD_BOARDS, seed=0, progress=False):
+    rng = random.Random(seed)
+    evaluator = loadHandEvaluator()
+    disjoint = ~OVERLAP_MASK
+
+    wins = np.zeros((NUM_HANDS, NUM_HANDS), dtype=np.int32)
+    counts = np.zeros((NUM_HANDS, NUM_HANDS), dtype=np.int32)
+    for boardNumber in range(numBoards):
+        ranks = boardRanks(rng.sample(FULL_DECK, NUM_COMMUNITY_CARDS), evaluator)
+        live = ranks > 0
+        valid = disjoint & live[:, None] & live[None, :]
+        wins += valid & (ranks[:, None] <= ranks[None, :])
+        counts += valid
+        if progress and (boardNumber + 1) % 500 == 0:
+            print(f"{boardNumber + 1:,} / {numBoards:,} boards")
+
+    totalWins = np.zeros((NUM_HANDS, NUM_HANDS), dtype=np.int64)
+    totalCounts = np.zeros((NUM_HANDS, NUM_HANDS), dtype=np.int64)
+    for permutation in suitPermutations():
+        # entry [perm[a], perm[b]] goes to [a, b]
+        totalWins += wins[np.ix_(permutation, permutation)]
+        totalCounts += counts[np.ix_(permutation, permutation)]
+
+    equity = np.divide(
+        totalWins,
+        totalCounts,
+        out=np.zeros((NUM_HANDS, NUM_HANDS)),
+        where=totalCounts > 0,
+    )
+    return np.rint(equity * EQUITY_SCALE).astype(np.uint16)
+
+
+class PreflopEquity:
+    def __init__(self, matrix):
+        self.matrix = matrix  # (1326, 1326) uint16, usually a memmap
+
+    @staticmethod
+    def fromFile(path=None):
+        path = path or cachePath(EQUITY_FILE)
+        try:
+            return PreflopEquity(np.load(path, mmap_mode="r"))
+        except FileNotFoundError:
+            return None  # not built, callers simulate instead
+
+    def handVsHand(self, hand, villainHand):
+        return float(self.matrix[handIndex(hand), handIndex(villainHand)]) / (
+            EQUITY_SCALE
+        )
+
+    def vsRandomHand(self, hand):
+        # overlapping villains are stored as 0, so they drop out of the sum
+        row = self.matrix[handIndex(hand)]
+        return int(row.sum(dtype=np.int64)) / (VILLAIN_HANDS * EQUITY_SCALE)
+
+    def rangeVsRange(self, heroWeights, villainWeights):
+        # weights: length 1326 arrays over handIndex, combos that share a
+        # card with each other are left out
+        heroWeights = np.asarray(heroWeights, dtype=np.float64)
+        villainWeights = np.asarray(villainWeights, dtype=np.float64)
+        pairWeights = np.outer(heroWeights, villainWeights) * ~OVERLAP_MASK
+        total = pairWeights.sum()
+        if total == 0:
+            return 0.0
+        return float((pairWeights * self.matrix).sum() / (total * EQUITY_SCALE))
+
+
+_preflopEquity = None
+_loaded = False
+
+
+def loadPreflopEquity():
+    # None if the matrix hasn't been built
+    global _preflopEquity, _loaded
+
+    if not _loaded:
+        _preflopEquity = PreflopEquity.fromFile()
+        _loaded = True
+    return _preflopEquity
+
+
+def preflopEquityVsOne(hand):
+    # heads-up equity against an unknown hand, or None if there's no matrix
+    table = loadPreflopEquity()
+    return None if table is None else table.vsRandomHand(hand)
+
+
+# * Offline build: python preflop.py
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the preflop equity matrix")
+    parser.add_argument("--boards", type=int, default=BUILD_BOARDS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(sys.argv[1:])
+
+    startTime = time.perf_counter()
+    matrix = buildEquityMatrix(args.boards, args.seed, progress=True)
+    with atomicWrite(cachePath(EQUITY_FILE)) as matrixFile:
+        np.save(matrixFile, matrix)
+    elapsed = time.perf_counter() - startTime
+    print(f"{NUM_HANDS:,} x {NUM_HANDS:,} matrix from {args.boards:,} boards")
+    print(f"built in {elapsed:.1f}s")
@@ -0,0 +1,256 @@
+import pathlib
+import struct
+
+import numpy as np
+
+# * Columnar on-disk store for per-hand simulation results
+
+"""
+A store is a directory with one file per column plus a schema file. Each
+column file is a small header (magic, version, dtype, row count) followed
+by the raw values, so a column opens as a read-only memmap and nothing is
+loaded until it's touched. Rows are buffered and appended in chunks, and
+the row counts in the headers are only bumped after the data is written,
+so a store that was cut off mid-write still reads back whole rows.
+
+The aggregation helpers walk the memmaps a chunk at a time, so memory
+stays flat however many rows there are
+"""
+
+SCHEMA_FILE = "schema.bin"
+SCHEMA_MAGIC = b"PRSS"
+COLUMN_MAGIC = b"PRSC"
+STORE_VERSION = 1
+SCHEMA_HEADER_FORMAT = "<4sHH"  # magic, version, number of columns
+SCHEMA_COLUMN_FORMAT = "<24s8s"  # name, dtype
+COLUMN_HEADER_FORMAT = "<4sH8sQ"  # magic, version, dtype, rows
+COLUMN_HEADER_SIZE = struct.calcsize(COLUMN_HEADER_FORMAT)
+
+CHUNK_ROWS = 1 << 16  # rows per write, and per step when aggregating
+
+# one row per seat per hand
+HAND_COLUMNS = (
+    ("hand", "<u8"),
+    ("seat", "<u1"),
+    ("bot", "<u1"),  # index into the store's bot names
+    ("stage", "<u1"),  # street the hand ended on
+    ("chipsWon", "<i4"),
+    # win probability (percent) on each street, NaN once folded
+    ("preflopEquity", "<f4"),
+    ("flopEquity", "<f4"),
+    ("turnEquity", "<f4"),
+    ("riverEquity", "<f4"),
+)
+EQUITY_COLUMNS = ("preflopEquity", "flopEquity", "turnEquity", "riverEquity")
+
+
+def columnPath(path, name):
+    return pathlib.Path(path) / f"{name}.col"
+
+
+def botNamesPath(path):
+    return pathlib.Path(path) / "bots.txt"
+
+
+class ResultsWriter:
+    def __init__(self, path, botNames, columns=HAND_COLUMNS, chunkRows=CHUNK_ROWS):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.columns = [(name, np.dtype(dtype)) for name, dtype in columns]
+        self.chunkRows = chunkRows
+        self.botIndex = {name: i for i, name in enumerate(botNames)}
+
+        with open(self.path / SCHEMA_FILE, "wb") as schemaFile:
+            schemaFile.write(
+                struct.pack(
+                    SCHEMA_HEADER_FORMAT,
+                    SCHEMA_MAGIC,
+                    STORE_VERSION,
+                    len(self.columns),
+                )
+            )
+            for name, dtype in self.columns:
+                schemaFile.write(
+                    struct.pack(SCHEMA_COLUMN_FORMAT, name.encode(), dtype.str.encode())
+                )
+        botNamesPath(self.path).write_text("\n".join(botNames))
+
+        self.files = {}
+        for name, dtype in self.columns:
+            columnFile = open(columnPath(self.path, name), "wb+")
+            columnFile.write(
+                struct.pack(
+                    COLUMN_HEADER_FORMAT,
+                    COLUMN_MAGIC,
+                    STORE_VERSION,
+                    dtype.str.encode(),
+                    0,
+                )
+            )
+            self.files[name] = columnFile
+
+        self.buffers = {
+            name: np.empty(chunkRows, dtype) for name, dtype in self.columns
+        }
+        self.bufferedRows = 0
+        self.rowsWritten = 0
+
+    def addRow(self, **values):
+        row = self.bufferedRows
+        for name, value in values.items():
+            self.buffers[name][row] = value
+        self.bufferedRows += 1
+        if self.bufferedRows == self.chunkRows:
+            self.flush()
+
+    def addRows(self, **columns):
+        # whole arrays at once, e.g. from vectorized simulations
+        numRows = len(next(iter(columns.values())))
+        start = 0
+        while start < numRows:
+            count = min(numRows - start, self.chunkRows - self.bufferedRows)
+            for name, values in columns.items():
+                self.buffers[name][self.bufferedRows : self.bufferedRows + count] = (
+                    values[start : start + count]
+                )
+            self.bufferedRows += count
+            start += count
+            if self.bufferedRows == self.chunkRows:
+                self.flush()
+
+    def addHand(self, handId, game, chipsBefore, equities):
+        # equities: (seats, 4) array of win probabilities, NaN where folded;
+        # chipsBefore: every stack before the blinds went in
+        chipsWon = [
+            player.chips - chipsBefore[seat] for seat, player in enumerate(game.players)
+        ]
+        if sum(chipsWon) != 0:
+            # chips only ever move between seats
+            raise ValueError(f"hand {handId}: chips won add up to {sum(chipsWon)}")
+
+        for seat, player in enumerate(game.players):
+            self.addRow(
+                hand=handId,
+                seat=seat,
+                bot=self.botIndex[type(player).__name__],
+                stage=game.stage,
+                chipsWon=chipsWon[seat],
+                preflopEquity=equities[seat, 0],
+                flopEquity=equities[seat, 1],
+                turnEquity=equities[seat, 2],
+                riverEquity=equities[seat, 3],
+            )
+
+    def flush(self):
+        if not self.bufferedRows:
+            return
+        for name, columnFile in self.files.items():
+            columnFile.seek(0, 2)
+            columnFile.write(self.buffers[name][: self.bufferedRows].tobytes())
+        self.rowsWritten += self.bufferedRows
+        self.bufferedRows = 0
+
+        # data first, then the counts, so readers never see half a chunk
+        for name, columnFile in self.files.items():
+            columnFile.seek(COLUMN_HEADER_SIZE - 8)  # the count is last
+            columnFile.write(struct.pack("<Q", self.rowsWritten))
+            columnFile.flush()
+
+    def close(self):
+        self.flush()
+        for columnFile in self.files.values():
+            columnFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        data = (self.path / SCHEMA_FILE).read_bytes()
+        magic, version, numColumns = struct.unpack_from(SCHEMA_HEADER_FORMAT, data)
+        if magic != SCHEMA_MAGIC or version != STORE_VERSION:
+            raise ValueError(f"{path} is not a version {STORE_VERSION} results store")
+
+        self.dtypes = {}
+        offset = struct.calcsize(SCHEMA_HEADER_FORMAT)
+        for _ in range(numColumns):
+            name, dtype = struct.unpack_from(SCHEMA_COLUMN_FORMAT, data, offset)
+            offset += struct.calcsize(SCHEMA_COLUMN_FORMAT)
+            self.dtypes[name.rstrip(b"\0").decode()] = np.dtype(
+                dtype.rstrip(b"\0").decode()
+            )
+
+        self.botNames = botNamesPath(self.path).read_text().split("\n")
+        self.columns = {name: self.openColumn(name) for name in self.dtypes}
+        # a column can be ahead if a write was cut off, so go by the shortest
+        self.numRows = min(len(column) for column in self.columns.values())
+
+    def openColumn(self, name):
+        path = columnPath(self.path, name)
+        with open(path, "rb") as columnFile:
+            header = columnFile.read(COLUMN_HEADER_SIZE)
+        magic, version, dtype, numRows = struct.unpack(COLUMN_HEADER_FORMAT, header)
+        if magic != COLUMN_MAGIC or dtype.rstrip(b"\0").decode() != (
+            self.dtypes[name].str
+        ):
+            raise ValueError(f"{path} doesn't match the store's schema")
+        if numRows == 0:
+            return np.empty(0, self.dtypes[name])  # memmap can't map nothing
+        return np.memmap(
+            path,
+            self.dtypes[name],
+            mode="r",
+            offset=COLUMN_HEADER_SIZE,
+            shape=(numRows,),
+        )
+
+    def column(self, name):
+        return self.columns[name][: self.numRows]
+
+    def __len__(self):
+        return self.numRows
+
+    def chunks(self, *names, chunkRows=CHUNK_ROWS):
+        # slices of the given columns, one chunk at a time
+        for start in range(0, self.numRows, chunkRows):
+            yield [self.column(name)[start : start + chunkRows] for name in names]
+
+    def groupSum(self, valueName, byName, numGroups=None):
+        numGroups = numGroups or len(self.botNames)
+        sums = np.zeros(numGroups)
+        for values, groups in self.chunks(valueName, byName):
+            valid = ~np.isnan(values) if values.dtype.kind == "f" else slice(None)
+            sums += np.bincount(
+                groups[valid], weights=values[valid], minlength=numGroups
+            )
+        return sums
+
+    def groupCount(self, byName, valueName=None, numGroups=None):
+        # rows per group, only counting non-NaN values of valueName if given
+        numGroups = numGroups or len(self.botNames)
+        counts = np.zeros(numGroups, dtype=np.int64)
+        for values, groups in self.chunks(valueName or byName, byName):
+            valid = ~np.isnan(values) if values.dtype.kind == "f" else slice(None)
+            counts += np.bincount(groups[valid], minlength=numGroups)
+        return counts
+
+    def groupMean(self, valueName, byName="bot", numGroups=None):
+        sums = self.groupSum(valueName, byName, numGroups)
+        counts = self.groupCount(byName, valueName, numGroups)
+        return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    def botSummary(self):
+        # per bot: rows, mean chips won per hand and mean equity per street
+        hands = self.groupCount("bot")
+        summary = {"hands": hands, "chipsWon": self.groupMean("chipsWon")}
+        for name in EQUITY_COLUMNS:
+            summary[name] = self.groupMean(name)
+        return {
+            botName: {key: values[bot] for key, values in summary.items()}
+            for bot, botName in enumerate(self.botNames)
+        }
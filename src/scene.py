@@ -0,0 +1,289 @@
+import time
+
+from cmu_graphics import *
+from treys import Card, Deck
+
+from constants import *
+from metrics import METRICS
+from texture import boardTexture, textureNames
+
+# * Retained scene for the game screen
+
+"""
+Creating a cmu_graphics Label measures its text with the font machinery,
+which costs milliseconds per label, and game_redrawAll used to create
+every shape again after every event. Here all the shapes are created once
+(in setupGame) inside one Group. game_redrawAll only puts that group back
+on the canvas and updates the dynamic shapes, and a property is only
+assigned when its value actually changed, so an event that doesn't change
+the table costs next to nothing
+"""
+
+CARD_WIDTH = 60
+CARD_HEIGHT = 90
+CARD_GAP = 15
+
+# (text, color) for every card, instead of formatting them on every redraw
+CARD_LABELS = {}
+for card in Deck.GetFullDeck():
+    cardStr = Card.int_to_pretty_str(card)[1:-1]
+    CARD_LABELS[card] = (cardStr, "red" if cardStr[-1] in ["♥", "♦"] else "black")
+
+
+def setIfChanged(shape, attr, value):
+    if getattr(shape, attr) != value:
+        setattr(shape, attr, value)
+
+
+def seatPosition(app, playerIndex):
+    angle = 360 / NUM_PLAYERS * (playerIndex + 1)
+    centerX = app.width / 2
+    centerY = app.height / 2 - Y_OFFSET - app.padding
+    radiusX = 400
+    radiusY = 300
+
+    return (
+        centerX + radiusX * cos(radians(angle)),
+        centerY + radiusY * sin(radians(angle)),
+    )
+
+
+class CardSlot:
+    def __init__(self):
+        self.rect = Rect(0, 0, CARD_WIDTH, CARD_HEIGHT, fill="white", visible=False)
+        self.label = Label("", 0, 0, size=22, visible=False)
+
+    def show(self, x, y, card=None, isFolded=False):
+        # card None is a facedown card
+        setIfChanged(self.rect, "left", x)
+        setIfChanged(self.rect, "top", y)
+        setIfChanged(self.rect, "visible", True)
+
+        if card is None:
+            setIfChanged(self.rect, "fill", "grey" if isFolded else "darkRed")
+            setIfChanged(self.label, "visible", False)
+            return
+
+        text, suitColor = CARD_LABELS[card]
+        setIfChanged(self.rect, "fill", "grey" if isFolded else "white")
+        setIfChanged(self.label, "value", text)
+        setIfChanged(self.label, "fill", suitColor)
+        setIfChanged(self.label, "centerX", x + CARD_WIDTH / 2)
+        setIfChanged(self.label, "centerY", y + CARD_HEIGHT / 2)
+        setIfChanged(self.label, "visible", True)
+
+    def hide(self):
+        setIfChanged(self.rect, "visible", False)
+        setIfChanged(self.label, "visible", False)
+
+
+def showCardRow(slots, startX, startY, cards, isFolded=False, faceUp=True):
+    cardsTotalWidth = len(cards) * CARD_WIDTH + (len(cards) - 1) * CARD_GAP
+    startX -= cardsTotalWidth / 2
+
+    for i, slot in enumerate(slots):
+        if i < len(cards):
+            cardX = startX + i * (CARD_WIDTH + CARD_GAP)
+            slot.show(cardX, startY, cards[i] if faceUp else None, isFolded)
+        else:
+            slot.hide()
+
+
+class Button:
+    def __init__(self, app, text, position):
+        x, y = position
+        self.rect = Rect(x, y, app.buttonWidth, app.buttonHeight, fill="silver")
+        self.label = Label(
+            text,
+            x + app.buttonWidth / 2,
+            y + app.buttonHeight / 2,
+            size=14,
+            fill="black",
+        )
+
+    def setText(self, text):
+        setIfChanged(self.label, "value", text)
+
+
+OVERLAY_LINES = 10
+OVERLAY_REFRESH = 0.5  # seconds; setting a label's text re-measures it
+
+
+class MetricsOverlay:
+    def __init__(self):
+        self.group = Group(Rect(10, 10, 330, 20 * OVERLAY_LINES + 10, opacity=60))
+        self.labels = [
+            Label("", 20, 25 + 20 * i, size=13, fill="white", align="left")
+            for i in range(OVERLAY_LINES)
+        ]
+        self.group.add(*self.labels)
+        self.lastRefresh = 0
+
+    def lines(self):
+        def timing(name):
+            last = METRICS.last(name) * 1000
+            p95 = METRICS.percentile(name, 0.95) * 1000
+            return f"{last:.1f} ms (p95 {p95:.1f})"
+
+        lines = [
+            f"FPS {METRICS.rate('redraw'):.0f}, redraw {timing('redraw')}",
+            f"equity {timing('equity')}",
+        ]
+        for name in METRICS.names("bot "):
+            lines.append(f"{name[4:]} {timing(name)}")
+        for name, valueFn in METRICS.gauges.items():
+            lines.append(f"{name} {valueFn():.0%}")
+        return lines
+
+    def update(self):
+        now = time.perf_counter()
+        if now - self.lastRefresh < OVERLAY_REFRESH:
+            return
+        self.lastRefresh = now
+
+        lines = self.lines()
+        for i, label in enumerate(self.labels):
+            setIfChanged(label, "value", lines[i] if i < len(lines) else "")
+
+
+class TableScene:
+    def __init__(self, app):
+        self.group = Group()
+
+        # static: created once and never touched again
+        self.group.add(Image(app.image, app.width / 2, app.height / 2, align="center"))
+        for i, player in enumerate(app.game.players):
+            playerX, playerY = seatPosition(app, i)
+            self.group.add(
+                Circle(playerX, playerY, 30, fill="black"),
+                Label(
+                    type(player).__name__,
+                    playerX,
+                    playerY - 60,
+                    size=14,
+                    fill="white",
+                ),
+            )
+
+        # dynamic
+        self.chipLabels = []
+        self.probLabels = []
+        self.handSlots = []
+        for i in range(len(app.game.players)):
+            playerX, playerY = seatPosition(app, i)
+            self.chipLabels.append(Label("", playerX, playerY, size=14, fill="white"))
+            self.probLabels.append(
+                Label("", playerX, playerY - 40, size=14, fill="white", visible=False)
+            )
+            self.handSlots.append([CardSlot() for _ in range(NUM_PLAYER_CARDS)])
+
+        self.communitySlots = [CardSlot() for _ in range(NUM_COMMUNITY_CARDS)]
+        self.potLabel = Label(
+            "", app.width / 2, app.height / 2 + 20, size=20, fill="white"
+        )
+        self.boardLabel = Label(
+            "", app.width / 2, app.height / 2 + 45, size=14, fill="white"
+        )
+
+        self.toggleButton = Button(app, "Reveal", app.toggleButtonLocation)
+        self.checkButton = Button(app, "Check", app.checkButtonLocation)
+        self.raiseButton = Button(app, "Bet: $0", app.raiseButtonLocation)
+        self.foldButton = Button(app, "Fold", app.foldButtonLocation)
+
+        for i in range(len(app.game.players)):
+            self.group.add(self.chipLabels[i], self.probLabels[i])
+            for slot in self.handSlots[i]:
+                self.group.add(slot.rect, slot.label)
+        for slot in self.communitySlots:
+            self.group.add(slot.rect, slot.label)
+        self.group.add(self.potLabel, self.boardLabel)
+        for button in (
+            self.toggleButton,
+            self.checkButton,
+            self.raiseButton,
+            self.foldButton,
+        ):
+            self.group.add(button.rect, button.label)
+
+        self.probTexts = {}  # seat: (what the label depends on, text)
+        self.overlay = MetricsOverlay()
+        self.shownState = None
+
+    def tableState(self, app):
+        # everything the dynamic shapes show, to skip redraws that change nothing
+        game = app.game
+        return (
+            tuple(
+                (p.chips, tuple(p.hand), p.isFolded, p.winProbability)
+                for p in game.players
+            ),
+            tuple(game.communityCards),
+            game.pot,
+            game.players[0].checkOrCall,
+            app.showOtherPlayersCards,
+            app.betAmountStr,
+        )
+
+    def update(self, app):
+        state = self.tableState(app)
+        if state == self.shownState:
+            return
+        self.shownState = state
+
+        game = app.game
+        for i, player in enumerate(game.players):
+            playerX, playerY = seatPosition(app, i)
+            setIfChanged(self.chipLabels[i], "value", str(player.chips))
+
+            faceUp = i == 0 or app.showOtherPlayersCards
+            showCardRow(
+                self.handSlots[i],
+                playerX,
+                playerY + 40,
+                player.hand,
+                player.isFolded,
+                faceUp,
+            )
+
+            setIfChanged(self.probLabels[i], "visible", faceUp)
+            if faceUp:
+                setIfChanged(self.probLabels[i], "value", self.probText(i, game))
+
+        showCardRow(
+            self.communitySlots,
+            app.width / 2,
+            app.height / 2 - Y_OFFSET - app.padding,
+            game.communityCards,
+        )
+
+        setIfChanged(self.potLabel, "value", f"Pot: ${game.pot}")
+        boardText = ""
+        if len(game.communityCards) >= NUM_FLOP_CARDS:
+            bits, _ = boardTexture(game.communityCards)
+            boardText = ", ".join(textureNames(bits))
+        setIfChanged(self.boardLabel, "value", boardText)
+        self.toggleButton.setText("Hide" if app.showOtherPlayersCards else "Reveal")
+        self.checkButton.setText(game.players[0].checkOrCall)
+        self.raiseButton.setText(
+            f"Bet: ${app.betAmountStr if app.betAmountStr else '0'}"
+        )
+
+    def probText(self, playerIndex, game):
+        # hand name and bucket only change with the cards, so keep the text
+        player = game.players[playerIndex]
+        inputs = (tuple(player.hand), len(game.communityCards), player.winProbability)
+        cached = self.probTexts.get(playerIndex)
+        if cached is None or cached[0] != inputs:
+            handStrength = player.evaluateHandStrength(game.communityCards)
+            bucket = player.getHandStrengthBucket(game)
+            text = f"{handStrength}, Win: {player.winProbability:.1f}%, EHS: {bucket}"
+            cached = self.probTexts[playerIndex] = (inputs, text)
+        return cached[1]
+
+    def draw(self, app):
+        # the canvas is cleared before every redraw, so put the group back
+        self.update(app)
+        app.group.add(self.group)
+        if app.showMetrics:
+            self.overlay.update()
+            app.group.add(self.overlay.group)
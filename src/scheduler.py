@@ -0,0 +1,233 @@
+import random
+import threading
+import time
+
+from equity import sampleOutcomes
+
+# * Equity jobs worked out in the order seats act, each by a deadline
+
+"""
+Without a scheduler every seat's equity is simulated in seat order as soon
+as a street is dealt, so the first seat to act waits for all six. With one
+(Game(equityDeadline=...)), dealing a street only queues a job per seat
+still in the hand, next to act first, and the k-th job is due k deadlines
+after the street was dealt. When a seat acts, its job is run a chunk of
+samples at a time until it has all game.numSimulations samples or it's
+past due, and whatever estimate it has by then is used.
+
+A background thread works through the queue in the same order in the
+meantime (while the human thinks, or between bot actions), so later seats
+usually find their job finished. Jobs draw from their own Random seeded
+from the seat's rng, so the thread never shares a stream with the game.
+
+While the game waits on the human, prefetch also queues the next street's
+jobs behind the current ones. The deck is already shuffled, so the next
+board is known and the only guess is who folds: every seat still in gets
+a job for nobody folding, then for one fewer opponent. Jobs are kept by
+(hand, board, opponents) for the rest of the hand, so when the street is
+dealt, schedule picks up whatever was worked out in the meantime
+"""
+
+STREET_OF_BOARD = {0: 0, 3: 1, 4: 2, 5: 3}  # board cards: game.stage
+NEXT_STREET_CARDS = {0: 3, 1: 1, 2: 1}  # cards dealt after each stage
+CHUNK_SAMPLES = 50  # samples per step, also the least an estimate is based on
+IDLE_SECONDS = 30.0  # the thread exits after this long with nothing queued
+
+
+class EquityJob:
+    def __init__(self, player, game, deadline, board=None, numOpponents=None):
+        # board and numOpponents default to the table's, prefetching guesses
+        self.board = game.communityCards if board is None else board
+        if numOpponents is None:
+            numOpponents = player.opponentsLeft(game)
+        self.numOpponents = numOpponents
+        self.key = jobKey(player, self.board, numOpponents)
+        self.hand = player.hand
+        self.numSamples = game.numSimulations
+        self.evaluator = game.evaluator
+        self.mode = game.equityMode
+        rng = player.equityRng(game, STREET_OF_BOARD[len(self.board)])
+        # crn streams are shared by design, anything else gets its own
+        self.rng = rng if self.mode == "crn" else random.Random(rng.getrandbits(32))
+        self.deadline = deadline
+
+        self.exact = None
+        if board is None:
+            self.exact = player.lookedUpEquity(game, numOpponents)
+        self.samples = 0  # samples asked for so far, including running chunks
+        self.samplesDone = 0
+        self.wins = 0.0
+        self.outcomes = 0
+
+    def isDone(self):
+        return self.exact is not None or self.samples >= self.numSamples
+
+    def estimate(self):
+        if self.exact is not None:
+            return self.exact
+        return self.wins / self.outcomes if self.outcomes else 0.0
+
+
+def jobKey(player, board, numOpponents):
+    # a fold changes the number of opponents, and so the job
+    return (tuple(player.hand), tuple(board), numOpponents)
+
+
+class EquityScheduler:
+    def __init__(self, deadline, chunkSamples=CHUNK_SAMPLES, background=True):
+        self.deadline = deadline  # seconds per job, in the order seats act
+        self.chunkSamples = chunkSamples
+        self.background = background
+        self.jobs = {}  # player: job
+        self.queue = []  # jobs in the order they're due
+        self.known = {}  # key: job, everything made this hand
+        self.knownHand = None  # game.handsPlayed when known was started
+        self.prefetchHits = 0
+        self.lock = threading.Lock()
+        self.wakeUp = threading.Condition(self.lock)
+        self.chunkDone = threading.Condition(self.lock)
+        self.thread = None
+
+    def schedule(self, game):
+        # a new street (or hand): a job per seat still in, next to act first
+        now = time.perf_counter()
+        numSeats = len(game.players)
+        order = [
+            game.players[(game.currentPlayerIndex + i) % numSeats]
+            for i in range(1, numSeats + 1)
+        ]
+
+        jobs = {}
+        queue = []
+        with self.lock:
+            if self.knownHand != game.handsPlayed:
+                self.known = {}
+                self.knownHand = game.handsPlayed
+
+            for player in order:
+                if player.isFolded or player.isAllIn:
+                    continue
+                deadline = now + self.deadline * (len(queue) + 1)
+                key = jobKey(player, game.communityCards, player.opponentsLeft(game))
+                job = self.known.get(key)
+                if job is None:
+                    job = EquityJob(player, game, deadline)
+                    self.known[key] = job
+                else:
+                    job.deadline = deadline
+                    self.prefetchHits += job.samples > 0
+                jobs[player] = job
+                queue.append(job)
+
+            self.jobs = jobs
+            self.queue = queue
+            self.wakeUp.notify()
+        self.startThread()
+
+    def prefetch(self, game):
+        # the next street's jobs, behind this street's, while the human thinks
+        if game.stage not in NEXT_STREET_CARDS:
+            return
+        numCards = NEXT_STREET_CARDS[game.stage]
+        nextBoard = game.communityCards + game.deck.cards[-numCards:][::-1]
+
+        live = [p for p in game.players if not p.isFolded and not p.isAllIn]
+        guesses = []
+        for foldedOpponents in (0, 1):
+            for player in live:
+                numOpponents = player.opponentsLeft(game) - foldedOpponents
+                if numOpponents >= 1:
+                    guesses.append((player, numOpponents))
+
+        with self.lock:
+            for player, numOpponents in guesses:
+                key = jobKey(player, nextBoard, numOpponents)
+                if key not in self.known:
+                    job = EquityJob(player, game, float("inf"), nextBoard, numOpponents)
+                    self.known[key] = job
+                    self.queue.append(job)
+            self.wakeUp.notify()
+        self.startThread()
+
+    def equity(self, player, game):
+        # this seat's estimate, refined until it's finished or due
+        job = self.jobs.get(player)
+        if job is None or job.key != jobKey(
+            player, game.communityCards, player.opponentsLeft(game)
+        ):
+            job = EquityJob(player, game, time.perf_counter() + self.deadline)
+            with self.lock:
+                self.jobs[player] = job
+                self.known.setdefault(job.key, job)
+                self.queue.insert(0, job)
+
+        while not job.isDone() and (
+            job.samples < self.chunkSamples or time.perf_counter() < job.deadline
+        ):
+            self.runChunk(job)
+        with self.lock:
+            # the thread may still be running a chunk asked for before now
+            samplesAsked = job.samples
+            while job.samplesDone < samplesAsked:
+                self.chunkDone.wait()
+        return job.estimate()
+
+    def runChunk(self, job):
+        # the samples are reserved first, since the thread and equity() can
+        # both be refining the same job
+        with self.lock:
+            count = min(self.chunkSamples, job.numSamples - job.samples)
+            if count <= 0:
+                return
+            job.samples += count
+
+        outcomes = []
+        try:
+            outcomes = sampleOutcomes(
+                job.hand,
+                job.board,
+                job.numOpponents,
+                count,
+                job.evaluator,
+                job.mode,
+                job.rng,
+            )
+        finally:
+            with self.lock:
+                job.wins += float(sum(outcomes))
+                job.outcomes += len(outcomes)
+                job.samplesDone += count
+                self.chunkDone.notify_all()
+
+    def pendingJob(self):
+        # with the lock held
+        self.queue = [job for job in self.queue if not job.isDone()]
+        return self.queue[0] if self.queue else None
+
+    def startThread(self):
+        if not self.background:
+            return
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.refineForever, daemon=True)
+            self.thread.start()
+
+    def refineForever(self):
+        while True:
+            with self.lock:
+                job = self.pendingJob()
+                if job is None:
+                    self.wakeUp.wait(IDLE_SECONDS)
+                    job = self.pendingJob()
+                    if job is None:
+                        return  # started again by the next schedule()
+            self.runChunk(job)
+
+    def refine(self, seconds):
+        # the same work as the thread, for callers that have idle time to give
+        stopAt = time.perf_counter() + seconds
+        while time.perf_counter() < stopAt:
+            with self.lock:
+                job = self.pendingJob()
+            if job is None:
+                return
+            self.runChunk(job)
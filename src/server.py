@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+import time
+
+from treys import Card
+
+from constants import *
+from headless import DEFAULT_LINEUP, quietOutput
+from logic import *
+from metrics import METRICS
+from snapshot import restoreGame, snapshotGame
+
+# * Multi-table server: python server.py --port 8765
+
+"""
+Hosts many Games at once over a JSON lines protocol on TCP (one JSON object
+per line, both ways). Remote players take the first seats of a table and
+are plain Players, the same way the human is in the UI; bots fill the rest.
+
+Client to server:
+  {"type": "join"}                            seat me at any table
+  {"type": "join", "table": 3}                seat me at table 3
+  {"type": "action", "action": "check"}       check, or call if there's a bet
+  {"type": "action", "action": "call"}
+  {"type": "action", "action": "bet", "amount": 50}
+  {"type": "action", "action": "fold"}
+
+Server to client:
+  {"type": "seated", "table": 3, "seat": 0}
+  {"type": "state", ..., "yourTurn": true}    after anything changes
+  {"type": "error", "message": "..."}
+
+Everything that runs the game (bot turns and their equity simulations)
+is CPU-bound Python, so it happens in worker processes, one job per table
+at a time, and the event loop only ever moves messages around. Each table
+lives in one worker for its whole life (by table number), so its Game,
+opponent stats and bots' search trees stay put; only the action goes
+over, and a snapshot (see snapshot.py) comes back, which the server
+restores as its read-only view of the table. A player that doesn't act
+within the action timeout is checked or folded, which bounds how long a
+table can stall
+"""
+
+DEFAULT_PORT = 8765
+ACTION_TIMEOUT = 30.0  # seconds before a remote player is checked/folded
+
+
+workerGames = {}  # in each worker process, table number: Game
+
+
+def rebuyBusted(game):
+    # rebuys busted stacks, so a table keeps going as long as anyone is seated
+    for player in game.players:
+        if player.chips <= 0:
+            player.chips = INITIAL_CHIPS
+    game.isFinished = False
+
+
+def advanceGame(game):
+    # runs in the executor: plays bots until a remote player is up
+    while True:
+        game.run(maxHands=1)
+        if game.handState == HAND_WAITING:
+            return
+        rebuyBusted(game)
+
+
+def applyAction(game, player, action, amount):
+    # runs in the executor, same rules as the buttons in graphics.py
+    if action in ("check", "call"):
+        if player.checkOrCall == "Call":
+            player.call(game)
+        else:
+            player.check(game)
+    elif action == "bet":
+        player.bet(amount, game)
+    elif action == "timeout":
+        # never calls: a seat that didn't act shouldn't put chips in
+        if player.canCheck(game):
+            player.check(game)
+        else:
+            player.fold(game)
+    else:
+        player.fold(game)
+
+    game.actionTaken = True
+    advanceGame(game)
+
+
+def startTable(tableId, numRemoteSeats, numSimulations):
+    # runs in the table's worker: deals the first hand, plays bots until a
+    # remote player is up
+    with quietOutput():
+        lineup = [Player] * numRemoteSeats
+        lineup += DEFAULT_LINEUP[: NUM_PLAYERS - numRemoteSeats]
+        game = Game(lineup, numSimulations=numSimulations)
+        advanceGame(game)
+    workerGames[tableId] = game
+    return snapshotGame(game)
+
+
+def playTurn(tableId, seat, action, amount):
+    # runs in the table's worker
+    game = workerGames[tableId]
+    with quietOutput():
+        applyAction(game, game.players[seat], action, amount)
+    return snapshotGame(game)
+
+
+def closeTable(tableId):
+    workerGames.pop(tableId, None)
+
+
+class Table:
+    def __init__(self, tableId, numRemoteSeats, numSimulations):
+        self.tableId = tableId
+        self.numRemoteSeats = numRemoteSeats
+        self.numSimulations = numSimulations
+        self.game = None  # a view of the worker's Game, restored from a snapshot
+        self.clients = {}  # seat: Client
+        self.lock = asyncio.Lock()
+        self.turnTimer = None
+
+    def freeSeat(self):
+        for seat in range(self.numRemoteSeats):
+            if seat not in self.clients:
+                return seat
+        return None
+
+    def waitingSeat(self):
+        game = self.game
+        if game is None or game.handState != HAND_WAITING:
+            return None
+        return game.currentPlayerIndex
+
+    def stateFor(self, seat):
+        game = self.game
+        return {
+            "type": "state",
+            "table": self.tableId,
+            "hand": game.handsPlayed,
+            "stage": game.stage,
+            "pot": game.pot,
+            "board": [Card.int_to_str(card) for card in game.communityCards],
+            "yourCards": [Card.int_to_str(card) for card in game.players[seat].hand],
+            "toCall": game.maxRaise - game.players[seat].chipsBetInRound,
+            "yourTurn": self.waitingSeat() == seat,
+            "players": [
+                {
+                    "seat": i,
+                    "name": type(player).__name__,
+                    "chips": player.chips,
+                    "bet": player.chipsBetInRound,
+                    "folded": player.isFolded,
+                    "allIn": player.isAllIn,
+                }
+                for i, player in enumerate(game.players)
+            ],
+        }
+
+
+class Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.table = None
+        self.seat = None
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write((json.dumps(message) + "\n").encode())
+
+
+class PokerServer:
+    def __init__(
+        self,
+        numSimulations=200,
+        numRemoteSeats=1,
+        actionTimeout=ACTION_TIMEOUT,
+        maxWorkers=None,
+    ):
+        self.numSimulations = numSimulations
+        self.numRemoteSeats = numRemoteSeats
+        self.actionTimeout = actionTimeout
+        # one process per worker, so a table always goes to the same one
+        self.workers = [
+            concurrent.futures.ProcessPoolExecutor(1)
+            for _ in range(maxWorkers or os.cpu_count() or 1)
+        ]
+        self.tables = {}
+        self.tableIds = itertools.count()
+        self.tasks = set()  # the loop only keeps weak references to tasks
+
+    def startTask(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def runOnWorker(self, table, fn, *args):
+        worker = self.workers[table.tableId % len(self.workers)]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(worker, fn, table.tableId, *args)
+
+    async def handleClient(self, reader, writer):
+        client = Client(reader, writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                    await self.handleMessage(client, message)
+                except (ValueError, KeyError, TypeError) as error:
+                    client.send({"type": "error", "message": str(error)})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            await self.leave(client)
+            writer.close()
+
+    async def handleMessage(self, client, message):
+        if message["type"] == "join":
+            await self.join(client, message.get("table"))
+        elif message["type"] == "action":
+            await self.act(client, message["action"], int(message.get("amount", 0)))
+        else:
+            raise ValueError(f"unknown message type {message['type']}")
+
+    async def join(self, client, tableId=None):
+        if client.table is not None:
+            raise ValueError("already seated")
+
+        if tableId is None:
+            table = next(
+                (t for t in self.tables.values() if t.freeSeat() is not None), None
+            )
+            if table is None:
+                tableId = next(self.tableIds)
+                table = self.tables[tableId] = Table(
+                    tableId, self.numRemoteSeats, self.numSimulations
+                )
+        elif tableId in self.tables:
+            table = self.tables[tableId]
+        else:
+            raise ValueError(f"no table {tableId}")
+
+        seat = table.freeSeat()
+        if seat is None:
+            raise ValueError(f"table {table.tableId} is full")
+
+        client.table, client.seat = table, seat
+        table.clients[seat] = client
+        client.send({"type": "seated", "table": table.tableId, "seat": seat})
+
+        async with table.lock:
+            if table.game is None:
+                data = await self.runOnWorker(
+                    table, startTable, table.numRemoteSeats, table.numSimulations
+                )
+                table.game = restoreGame(data)
+            await self.afterChange(table)
+
+    async def act(self, client, action, amount=0, timedOut=False):
+        table = client.table
+        if table is None:
+            raise ValueError("join a table first")
+        if action not in ("check", "call", "bet", "fold") and not timedOut:
+            raise ValueError(f"unknown action {action}")
+
+        async with table.lock:
+            if table.waitingSeat() != client.seat:
+                if not timedOut:
+                    client.send({"type": "error", "message": "not your turn"})
+                return
+
+            startTime = time.perf_counter()
+            data = await self.runOnWorker(table, playTurn, client.seat, action, amount)
+            table.game = restoreGame(data)
+            METRICS.record("server turn", time.perf_counter() - startTime)
+            await self.afterChange(table)
+
+    async def afterChange(self, table):
+        # called with the table lock held
+        if table.turnTimer is not None:
+            table.turnTimer.cancel()
+            table.turnTimer = None
+
+        for seat, client in table.clients.items():
+            client.send(table.stateFor(seat))
+
+        seat = table.waitingSeat()
+        if seat is None:
+            return
+        if seat not in table.clients:
+            # nobody in this seat (yet), so it just checks or folds
+            self.startTask(self.autoAct(table, seat))
+        else:
+            table.turnTimer = asyncio.get_running_loop().call_later(
+                self.actionTimeout,
+                lambda: self.startTask(self.autoAct(table, seat)),
+            )
+
+    async def autoAct(self, table, seat):
+        if self.tables.get(table.tableId) is not table:
+            return  # everyone left, so stop playing it
+        client = table.clients.get(seat) or Client(None, None)
+        client.table, client.seat = table, seat
+        await self.act(client, "timeout", timedOut=True)
+
+    async def leave(self, client):
+        table = client.table
+        if table is None:
+            return
+        del table.clients[client.seat]
+        client.table = None
+
+        async with table.lock:
+            if table.waitingSeat() == client.seat:
+                await self.afterChange(table)  # the empty seat acts for itself
+            if not table.clients:
+                if table.turnTimer is not None:
+                    table.turnTimer.cancel()
+                del self.tables[table.tableId]
+                self.startTask(self.runOnWorker(table, closeTable))
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handleClient, host, port)
+        print(f"Serving on {host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many poker tables over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--simulations", type=int, default=200)
+    parser.add_argument("--seats", type=int, default=1, help="remote seats per table")
+    parser.add_argument("--timeout", type=float, default=ACTION_TIMEOUT)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: cores)"
+    )
+    args = parser.parse_args(argv)
+
+    pokerServer = PokerServer(args.simulations, args.seats, args.timeout, args.workers)
+    with quietOutput():  # the game logic prints every action
+        asyncio.run(pokerServer.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
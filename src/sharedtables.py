@@ -0,0 +1,120 @@
+import contextlib
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from buckets import HandStrengthIndex, loadHandStrengthIndex, useHandStrengthIndex
+from equity import estimateEquity
+from evaluatortables import *
+
+# * Read-only tables placed once in shared memory for a pool of workers
+
+"""
+The parent copies the evaluator arrays (see evaluatortables.py) and the
+hand strength index (see buckets.py) into one shared memory block, and the
+pool initializer attaches every worker to it. The numpy arrays are views
+into the block, so nothing is copied per worker and nothing gets rebuilt;
+the only per-worker work is turning the evaluator arrays into the dicts
+treys looks ranks up in. The strategy table is already a memory-mapped
+file, which the OS shares between processes on its own
+"""
+
+ALIGNMENT = 64
+
+
+class SharedTables:
+    def __init__(self, arrays):
+        layout = {}  # name: (dtype, shape, offset)
+        size = 0
+        for name, array in arrays.items():
+            size += -size % ALIGNMENT
+            layout[name] = (array.dtype.str, array.shape, size)
+            size += array.nbytes
+
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, view in viewArrays(self.memory, layout).items():
+            view[...] = arrays[name]
+
+        # everything a worker needs to attach, small enough to pickle
+        self.spec = (self.memory.name, layout)
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+
+def viewArrays(memory, layout):
+    return {
+        name: np.ndarray(shape, dtype, buffer=memory.buf, offset=offset)
+        for name, (dtype, shape, offset) in layout.items()
+    }
+
+
+def buildSharedTables():
+    flushKeys, flushRanks, unsuitedKeys, unsuitedRanks = loadEvaluatorArrays()
+    index = loadHandStrengthIndex()
+    return SharedTables(
+        {
+            "flushKeys": flushKeys,
+            "flushRanks": flushRanks,
+            "unsuitedKeys": unsuitedKeys,
+            "unsuitedRanks": unsuitedRanks,
+            "handKeys": index.keys,
+            "handBuckets": index.buckets,
+        }
+    )
+
+
+_attachedMemory = None  # keeps the worker's mapping alive
+
+
+def attachSharedTables(spec):
+    # pool initializer: point this worker's tables at the shared block
+    global _attachedMemory
+
+    name, layout = spec
+    # pool workers report to the parent's resource tracker, which already
+    # knows the block, so attaching doesn't hand ownership to the worker
+    _attachedMemory = shared_memory.SharedMemory(name=name)
+
+    arrays = viewArrays(_attachedMemory, layout)
+    useLookupTable(
+        lookupTableFromArrays(
+            arrays["flushKeys"],
+            arrays["flushRanks"],
+            arrays["unsuitedKeys"],
+            arrays["unsuitedRanks"],
+        )
+    )
+    useHandStrengthIndex(HandStrengthIndex(arrays["handKeys"], arrays["handBuckets"]))
+
+
+@contextlib.contextmanager
+def sharedPool(processes=None, context=None):
+    tables = buildSharedTables()
+    context = context or multiprocessing.get_context()
+    try:
+        with context.Pool(
+            processes, initializer=attachSharedTables, initargs=(tables.spec,)
+        ) as pool:
+            yield pool
+    finally:
+        tables.close()
+
+
+def equityJob(job):
+    hand, board, numOpponents, numSamples, mode = job
+    return estimateEquity(hand, board, numOpponents, numSamples, loadEvaluator(), mode)
+
+
+def workerMemory(_=None):
+    # resident memory of this process in kB: private vs shared memory pages
+    memory = {"pid": os.getpid()}
+    with open("/proc/self/status") as status:
+        for line in status:
+            field, _, value = line.partition(":")
+            if field in ("RssAnon", "RssShmem"):
+                memory[field] = int(value.split()[0])
+    return memory
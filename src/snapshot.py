@@ -0,0 +1,254 @@
+import random
+import struct
+
+from treys import Deck
+
+from constants import *
+from equity import ESTIMATOR_MODES
+from evaluatortables import loadEvaluator
+from logic import *
+from stats import OpponentStats
+
+# * Compact binary snapshots of a Game, e.g. to checkpoint or ship a table
+
+"""
+A snapshot is a fixed header followed by the game, the seats, the deck,
+the board, the side pots and the action history, all packed with struct.
+Cards are stored as their index in the full deck (one byte each), seats in
+side pots as a bit mask, and strings as indices into the tuples below, so
+a table mid-hand is a few hundred bytes (pickle needs several kB) and
+packing it is cheap enough to do after every action.
+
+The tuples below are part of the format: append to them and bump
+SNAPSHOT_VERSION, never reorder them. Anything a snapshot can't hold (the
+evaluator, a bot's search tree) is rebuilt on restore, and opponent stats
+(see stats.py) start over
+"""
+
+SNAPSHOT_MAGIC = b"PGST"
+SNAPSHOT_VERSION = 2  # 2: blind amounts
+
+PLAYER_CLASSES = (
+    Player,
+    NaiveBotPlayer,
+    ConservativeBotPlayer,
+    TurnerBotPlayer,
+    FishBotPlayer,
+    AdvancedBotPlayer,
+    StrategyBotPlayer,
+    MCTSBotPlayer,
+)
+HAND_STATES = (HAND_BETTING, HAND_WAITING, HAND_OVER)
+ACTIONS = ("check", "call", "bet", "fold", "allin")
+
+FULL_DECK = Deck.GetFullDeck()
+CARD_INDEX = {card: i for i, card in enumerate(FULL_DECK)}
+DECK_RANDOM = random.Random()  # seeding a new one costs more than the restore
+
+HEADER = struct.Struct("<4sH")
+# seats, stage, hand state, flags, pot, max raise, current seat, consecutive
+# calls, blinds, hands played, crn seed, simulations, equity mode, the deck,
+# board, history and side pot lengths, and the blind amounts
+GAME = struct.Struct("<BBBBiiBBBBIIIBBBHBii")
+# class, flags, chips, bet in round, in pot, win probability, pot odds,
+# batch action (-1 for none), batch amount
+SEAT = struct.Struct("<BBiiiddbi")
+SIDE_POT = struct.Struct("<iB")  # size, eligible seats mask
+ACTION = struct.Struct("<BBii")  # seat, action, amount, pot before
+
+GAME_FLAGS = (
+    "actionTaken",
+    "hasRaised",
+    "isFinished",
+    "deferBatchDecisions",
+    "resumingDecision",
+)
+
+
+def packFlags(values):
+    return sum(1 << i for i, value in enumerate(values) if value)
+
+
+def unpackFlags(flags, count):
+    return [bool(flags >> i & 1) for i in range(count)]
+
+
+def packCards(cards):
+    return bytes(CARD_INDEX[card] for card in cards)
+
+
+def unpackCards(data):
+    return [FULL_DECK[i] for i in data]
+
+
+def snapshotGame(game):
+    players = game.players
+    parts = [
+        HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION),
+        GAME.pack(
+            len(players),
+            game.stage,
+            HAND_STATES.index(game.handState),
+            packFlags(getattr(game, name) for name in GAME_FLAGS),
+            game.pot,
+            game.maxRaise,
+            game.currentPlayerIndex,
+            game.consecutiveCalls,
+            game.smallBlindIndex,
+            game.bigBlindIndex,
+            game.handsPlayed,
+            game.crnSeed,
+            game.numSimulations,
+            ESTIMATOR_MODES.index(game.equityMode),
+            len(game.deck.cards),
+            len(game.communityCards),
+            len(game.actionHistory),
+            len(game.sidePots),
+            game.smallBlindAmount,
+            game.bigBlindAmount,
+        ),
+    ]
+
+    for player in players:
+        batchAction, batchAmount = player.batchDecision or (-1, 0)
+        parts.append(
+            SEAT.pack(
+                PLAYER_CLASSES.index(type(player)),
+                packFlags(
+                    (
+                        player.isFolded,
+                        player.isAllIn,
+                        player.worthCalling,
+                        player.checkOrCall == "Call",
+                    )
+                ),
+                player.chips,
+                player.chipsBetInRound,
+                player.chipsInPot,
+                player.winProbability,
+                player.potOdds,
+                batchAction,
+                batchAmount,
+            )
+        )
+        parts.append(packCards(player.hand))
+
+    parts.append(packCards(game.deck.cards))
+    parts.append(packCards(game.communityCards))
+
+    for potSize, eligiblePlayers in game.sidePots:
+        mask = packFlags(p in eligiblePlayers for p in players)
+        parts.append(SIDE_POT.pack(potSize, mask))
+
+    for seat, action, amount, potBefore in game.actionHistory:
+        parts.append(ACTION.pack(seat, ACTIONS.index(action), amount, potBefore))
+
+    return b"".join(parts)
+
+
+def restoreGame(data):
+    # builds the Game without __init__, which would deal and post blinds
+    magic, version = HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not a game snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"snapshot version {version}, expected {SNAPSHOT_VERSION}")
+    offset = HEADER.size
+
+    (
+        numPlayers,
+        stage,
+        handState,
+        flags,
+        pot,
+        maxRaise,
+        currentPlayerIndex,
+        consecutiveCalls,
+        smallBlindIndex,
+        bigBlindIndex,
+        handsPlayed,
+        crnSeed,
+        numSimulations,
+        equityMode,
+        deckSize,
+        boardSize,
+        historySize,
+        numSidePots,
+        smallBlindAmount,
+        bigBlindAmount,
+    ) = GAME.unpack_from(data, offset)
+    offset += GAME.size
+
+    game = Game.__new__(Game)
+    game.stage = stage
+    game.handState = HAND_STATES[handState]
+    for name, value in zip(GAME_FLAGS, unpackFlags(flags, len(GAME_FLAGS))):
+        setattr(game, name, value)
+    game.pot = pot
+    game.maxRaise = maxRaise
+    game.currentPlayerIndex = currentPlayerIndex
+    game.consecutiveCalls = consecutiveCalls
+    game.smallBlindIndex = smallBlindIndex
+    game.bigBlindIndex = bigBlindIndex
+    game.smallBlindAmount = smallBlindAmount
+    game.bigBlindAmount = bigBlindAmount
+    game.handsPlayed = handsPlayed
+    game.crnSeed = crnSeed
+    game.numSimulations = numSimulations
+    game.equityMode = ESTIMATOR_MODES[equityMode]
+    game.evaluator = loadEvaluator()
+    game.stats = OpponentStats(numPlayers)
+    game.equityScheduler = None
+
+    game.players = []
+    for _ in range(numPlayers):
+        (
+            classIndex,
+            seatFlags,
+            chips,
+            chipsBetInRound,
+            chipsInPot,
+            winProbability,
+            potOdds,
+            batchAction,
+            batchAmount,
+        ) = SEAT.unpack_from(data, offset)
+        offset += SEAT.size
+
+        player = PLAYER_CLASSES[classIndex].__new__(PLAYER_CLASSES[classIndex])
+        player.isFolded, player.isAllIn, player.worthCalling, isCall = unpackFlags(
+            seatFlags, 4
+        )
+        player.checkOrCall = "Call" if isCall else "Check"
+        player.chips = chips
+        player.chipsBetInRound = chipsBetInRound
+        player.chipsInPot = chipsInPot
+        player.winProbability = winProbability
+        player.potOdds = potOdds
+        player.batchDecision = None if batchAction < 0 else (batchAction, batchAmount)
+        player.hand = unpackCards(data[offset : offset + NUM_PLAYER_CARDS])
+        offset += NUM_PLAYER_CARDS
+        player.restoreTransientState()
+        game.players.append(player)
+
+    game.deck = Deck.__new__(Deck)
+    game.deck._random = DECK_RANDOM  # only used to reshuffle, which we never do
+    game.deck.cards = unpackCards(data[offset : offset + deckSize])
+    offset += deckSize
+    game.communityCards = unpackCards(data[offset : offset + boardSize])
+    offset += boardSize
+
+    game.sidePots = []
+    for _ in range(numSidePots):
+        potSize, mask = SIDE_POT.unpack_from(data, offset)
+        offset += SIDE_POT.size
+        eligiblePlayers = [p for seat, p in enumerate(game.players) if mask >> seat & 1]
+        game.sidePots.append((potSize, eligiblePlayers))
+
+    game.actionHistory = []
+    for _ in range(historySize):
+        seat, action, amount, potBefore = ACTION.unpack_from(data, offset)
+        offset += ACTION.size
+        game.actionHistory.append((seat, ACTIONS[action], amount, potBefore))
+
+    return game
@@ -0,0 +1,105 @@
+import itertools
+import struct
+import sys
+
+from cache import atomicWrite, cachePath
+from strategy import *
+
+"""
+Offline solver for the strategy table used by StrategyBotPlayer. Every cell
+(street, position, pot odds bucket, hand strength bucket) gets the action
+with the highest expected value under a simple opponent model: bets get
+folds in proportion to their size, and whoever calls holds a stronger range
+than average, more so the bigger the bet. Being out of position with more
+streets to come costs some of our equity, since we realize less of it
+"""
+
+OPPONENT_FOLDINESS = 0.6  # the bots at this table call a lot
+CALLER_STRENGTH_PER_POT = 0.1  # bigger bets get called by better hands
+ALL_IN_POT_FRACTION = 3.0
+OUT_OF_POSITION_COST = 0.05  # equity lost per street left to play
+
+
+def bucketEquity(strengthIndex):
+    return (strengthIndex + 0.5) / NUM_STRENGTH_BUCKETS
+
+
+def bucketCallAmount(potOddsIndex, pot=1.0):
+    if potOddsIndex == 0:
+        return 0.0
+
+    # middle of the required equity range, the last bucket is open-ended
+    if potOddsIndex == NUM_POT_ODDS_BUCKETS - 1:
+        requiredEquity = 0.7
+    else:
+        requiredEquity = (potOddsIndex - 0.5) / 10
+    return requiredEquity * pot / (1 - requiredEquity)
+
+
+def realizationFactor(street, position):
+    # positions 1-4 act after the blinds postflop; the later the better
+    lateness = position / 4 if 1 <= position <= 4 else 0
+    streetsLeft = NUM_STREETS - 1 - street
+    return 1 - OUT_OF_POSITION_COST * streetsLeft * (1 - lateness)
+
+
+def raiseEV(equity, pot, callAmount, potFraction):
+    betSize = potFraction * (pot + callAmount)
+    foldProbability = OPPONENT_FOLDINESS * potFraction / (1 + potFraction)
+
+    finalPot = pot + callAmount + 2 * betSize
+    callerEquity = equity * (1 - CALLER_STRENGTH_PER_POT * potFraction)
+    calledEV = callerEquity * finalPot - (callAmount + betSize)
+    return foldProbability * pot + (1 - foldProbability) * calledEV
+
+
+def solveCell(street, position, potOddsIndex, strengthIndex):
+    pot = 1.0
+    callAmount = bucketCallAmount(potOddsIndex, pot)
+    equity = bucketEquity(strengthIndex) * realizationFactor(street, position)
+
+    actionEVs = {
+        ACTION_FOLD: 0.0 if callAmount > 0 else float("-inf"),  # never fold a check
+        ACTION_CALL: equity * (pot + callAmount) - callAmount,
+        ACTION_ALL_IN: raiseEV(equity, pot, callAmount, ALL_IN_POT_FRACTION),
+    }
+    for action, potFraction in RAISE_POT_FRACTIONS.items():
+        actionEVs[action] = raiseEV(equity, pot, callAmount, potFraction)
+
+    return max(actionEVs, key=actionEVs.get)
+
+
+def solveStrategyTable():
+    cells = itertools.product(
+        range(NUM_STREETS),
+        range(NUM_POSITIONS),
+        range(NUM_POT_ODDS_BUCKETS),
+        range(NUM_STRENGTH_BUCKETS),
+    )
+    # product() walks the axes in the same order as tableOffset()
+    return bytes(solveCell(*cell) for cell in cells)
+
+
+def writeStrategyTable(path=None):
+    if path is None:
+        path = cachePath(STRATEGY_FILE)
+
+    header = struct.pack(
+        HEADER_FORMAT,
+        STRATEGY_MAGIC,
+        STRATEGY_VERSION,
+        NUM_STREETS,
+        NUM_POSITIONS,
+        NUM_POT_ODDS_BUCKETS,
+        NUM_STRENGTH_BUCKETS,
+    )
+    table = solveStrategyTable()
+    with atomicWrite(path) as tableFile:
+        tableFile.write(header + table)
+
+    return path
+
+
+if __name__ == "__main__":
+    path = writeStrategyTable(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"Wrote strategy table to {path}")
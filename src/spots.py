@@ -0,0 +1,157 @@
+import argparse
+import collections
+import contextlib
+import itertools
+import json
+import sys
+
+from treys import Card
+
+from equity import ESTIMATOR_MODES, callDecision, estimateEquity
+from evaluatortables import loadEvaluator
+from sharedtables import sharedPool
+
+# * Batch spot analysis: python spots.py spots.jsonl > results.jsonl
+
+"""
+Each input line is one spot, e.g.
+  {"hand": ["As", "Kd"], "board": ["2s", "7h", "9d"], "opponents": 2,
+   "pot": 120, "call": 40}
+and each output line is the same object with "equity" (in percent, like
+Player.winProbability), "potOdds" and "worthCalling" added, or "error" if
+the spot couldn't be read. Output stays in input order.
+
+Lines are read lazily and sent to the workers in batches, with only a few
+batches in flight at a time, so memory stays flat however long the input is
+"""
+
+BATCH_SIZE = 200
+BOARD_SIZES = (0, 3, 4, 5)
+BATCHES_IN_FLIGHT_PER_PROCESS = 2
+
+
+def readCards(spot):
+    # ValueError for anything that isn't a real hand and board
+    hand = [Card.new(card) for card in spot["hand"]]
+    board = [Card.new(card) for card in spot.get("board", [])]
+    if len(hand) != 2:
+        raise ValueError(f"hand needs 2 cards, got {len(hand)}")
+    if len(board) not in BOARD_SIZES:
+        raise ValueError(f"board needs 0, 3, 4 or 5 cards, got {len(board)}")
+    if len(set(hand + board)) != len(hand) + len(board):
+        raise ValueError("a card appears twice in the hand and board")
+    return hand, board
+
+
+def analyzeSpot(spot, numSamples, mode, evaluator):
+    hand, board = readCards(spot)
+    equity = estimateEquity(
+        hand, board, spot.get("opponents", 1), numSamples, evaluator, mode
+    )
+
+    winProbability = equity * 100
+    potOdds, worthCalling = callDecision(
+        winProbability, spot.get("pot", 0), spot.get("call", 0)
+    )
+    return {
+        **spot,
+        "equity": round(winProbability, 2),
+        "potOdds": potOdds if potOdds != float("inf") else None,
+        "worthCalling": worthCalling,
+    }
+
+
+def analyzeBatch(job):
+    # runs in a worker: raw lines in, finished output lines out
+    lines, numSamples, mode = job
+    evaluator = loadEvaluator()
+
+    results = []
+    for line in lines:
+        try:
+            spot = json.loads(line)
+            result = analyzeSpot(spot, numSamples, mode, evaluator)
+        except (ValueError, KeyError, TypeError) as error:
+            result = {"line": line.strip(), "error": f"{type(error).__name__}: {error}"}
+        results.append(json.dumps(result) + "\n")
+    return results
+
+
+def readBatches(inputFile, batchSize):
+    lines = (line for line in inputFile if line.strip())
+    while True:
+        batch = list(itertools.islice(lines, batchSize))
+        if not batch:
+            return
+        yield batch
+
+
+def analyzeStream(
+    inputFile, outputFile, numSamples, mode="plain", processes=1, batchSize=BATCH_SIZE
+):
+    jobs = ((batch, numSamples, mode) for batch in readBatches(inputFile, batchSize))
+    spotsDone = 0
+
+    if processes == 1:
+        for job in jobs:
+            results = analyzeBatch(job)
+            outputFile.writelines(results)
+            spotsDone += len(results)
+        return spotsDone
+
+    # Pool.imap would queue the whole input up front, so keep a bounded
+    # window of batches in flight and write them out in order
+    with sharedPool(processes) as pool:
+        pending = collections.deque()
+        maxPending = processes * BATCHES_IN_FLIGHT_PER_PROCESS
+        for job in jobs:
+            pending.append(pool.apply_async(analyzeBatch, (job,)))
+            if len(pending) >= maxPending:
+                results = pending.popleft().get()
+                outputFile.writelines(results)
+                spotsDone += len(results)
+
+        while pending:
+            results = pending.popleft().get()
+            outputFile.writelines(results)
+            spotsDone += len(results)
+
+    return spotsDone
+
+
+@contextlib.contextmanager
+def openOrStd(path, mode, stdFile):
+    if path == "-":
+        yield stdFile
+    else:
+        with open(path, mode) as file:
+            yield file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze poker spots from JSONL")
+    parser.add_argument("input", help="JSONL file of spots, or - for stdin")
+    parser.add_argument("--output", default="-", help="JSONL file, or - for stdout")
+    parser.add_argument("--samples", type=int, default=1_000)
+    parser.add_argument("--mode", choices=ESTIMATOR_MODES, default="plain")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    with openOrStd(args.input, "r", sys.stdin) as inputFile, openOrStd(
+        args.output, "w", sys.stdout
+    ) as outputFile:
+        spotsDone = analyzeStream(
+            inputFile,
+            outputFile,
+            args.samples,
+            args.mode,
+            args.processes,
+            args.batch_size,
+        )
+
+    print(f"Analyzed {spotsDone} spots", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,104 @@
+import numpy as np
+
+# * Running per-seat opponent statistics (VPIP, PFR, aggression, fold to bet)
+
+"""
+Game.recordAction hands every action to the table's OpponentStats, which
+only bumps a few counters, so the cost per action and the memory stay the
+same however many hands are played. The rates are worked out from the
+counters when they're read. Counters from different tables (or runs) can
+be added together with merge
+"""
+
+# counter columns
+HANDS = 0  # hands dealt in
+VPIP_HANDS = 1  # hands with money put in voluntarily preflop
+PFR_HANDS = 2  # hands with a preflop raise
+AGGRESSIVE = 3  # bets, raises and all-ins that raise
+CALLS = 4
+CHECKS = 5
+FOLDS = 6
+FACED_BET = 7  # decisions with something to call
+FOLDED_TO_BET = 8
+NUM_COUNTERS = 9
+
+
+class OpponentStats:
+    def __init__(self, numSeats):
+        self.counts = np.zeros((numSeats, NUM_COUNTERS), dtype=np.int64)
+        # whether VPIP/PFR were already counted for the current hand
+        self.countedVPIP = [False] * numSeats
+        self.countedPFR = [False] * numSeats
+
+    def startHand(self, players):
+        for seat, player in enumerate(players):
+            self.countedVPIP[seat] = self.countedPFR[seat] = False
+            if player.chips > 0:  # busted players sit out
+                self.counts[seat, HANDS] += 1
+
+    def record(self, seat, action, amount, toCall, isPreflop, isBlind):
+        # called before the chips move, so toCall is what the seat was facing
+        if isBlind:
+            return  # forced, so it says nothing about the player
+
+        counts = self.counts[seat]
+        if toCall > 0:
+            counts[FACED_BET] += 1
+
+        if action == "fold":
+            counts[FOLDS] += 1
+            if toCall > 0:
+                counts[FOLDED_TO_BET] += 1
+            return
+        if action == "check":
+            counts[CHECKS] += 1
+            return
+
+        isRaise = action == "bet" or (action == "allin" and amount > toCall)
+        if isRaise:
+            counts[AGGRESSIVE] += 1
+        elif amount > 0:
+            counts[CALLS] += 1
+        else:
+            counts[CHECKS] += 1  # calling nothing
+            return
+
+        if isPreflop:
+            if not self.countedVPIP[seat]:
+                self.countedVPIP[seat] = True
+                counts[VPIP_HANDS] += 1
+            if isRaise and not self.countedPFR[seat]:
+                self.countedPFR[seat] = True
+                counts[PFR_HANDS] += 1
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    def rate(self, seat, numerator, denominator):
+        total = self.counts[seat, denominator]
+        return self.counts[seat, numerator] / total if total else 0.0
+
+    def vpip(self, seat):
+        return self.rate(seat, VPIP_HANDS, HANDS)
+
+    def pfr(self, seat):
+        return self.rate(seat, PFR_HANDS, HANDS)
+
+    def aggressionFactor(self, seat):
+        # (bets + raises) / calls, the usual way it's quoted
+        return self.rate(seat, AGGRESSIVE, CALLS)
+
+    def foldToBet(self, seat):
+        return self.rate(seat, FOLDED_TO_BET, FACED_BET)
+
+    def hands(self, seat):
+        return int(self.counts[seat, HANDS])
+
+    def summary(self, seat):
+        return {
+            "hands": self.hands(seat),
+            "vpip": self.vpip(seat),
+            "pfr": self.pfr(seat),
+            "af": self.aggressionFactor(seat),
+            "foldToBet": self.foldToBet(seat),
+        }
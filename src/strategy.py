@@ -0,0 +1,93 @@
+import mmap
+import struct
+
+from cache import cachePath
+from constants import *
+
+# * Precomputed strategy table (built offline by solver.py)
+
+STRATEGY_FILE = "strategy.bin"
+STRATEGY_MAGIC = b"PSTR"
+STRATEGY_VERSION = 1
+HEADER_FORMAT = "<4sH4B"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# table axes
+NUM_STREETS = 4
+NUM_POSITIONS = NUM_PLAYERS
+NUM_POT_ODDS_BUCKETS = 8  # bucket 0 means there is nothing to call
+NUM_STRENGTH_BUCKETS = 10
+
+# actions stored in the table, one byte per cell
+ACTION_FOLD = 0
+ACTION_CALL = 1  # check when there is nothing to call
+ACTION_RAISE_HALF_POT = 2
+ACTION_RAISE_POT = 3
+ACTION_ALL_IN = 4
+
+RAISE_POT_FRACTIONS = {ACTION_RAISE_HALF_POT: 0.5, ACTION_RAISE_POT: 1.0}
+
+
+def potOddsBucket(callAmount, pot):
+    if callAmount <= 0:
+        return 0
+
+    # share of the final pot we have to put in, i.e. the equity needed to call
+    requiredEquity = callAmount / (pot + callAmount)
+    return min(1 + int(requiredEquity * 10), NUM_POT_ODDS_BUCKETS - 1)
+
+
+def strengthBucket(winProbability):
+    # winProbability is a percentage, as stored on Player
+    return min(
+        int(winProbability / 100 * NUM_STRENGTH_BUCKETS), NUM_STRENGTH_BUCKETS - 1
+    )
+
+
+def tableOffset(street, position, potOddsIndex, strengthIndex):
+    return (
+        (street * NUM_POSITIONS + position) * NUM_POT_ODDS_BUCKETS + potOddsIndex
+    ) * NUM_STRENGTH_BUCKETS + strengthIndex
+
+
+class StrategyTable:
+    def __init__(self, path):
+        with open(path, "rb") as tableFile:
+            self.buffer = mmap.mmap(tableFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, *shape = struct.unpack_from(HEADER_FORMAT, self.buffer)
+        expectedShape = [
+            NUM_STREETS,
+            NUM_POSITIONS,
+            NUM_POT_ODDS_BUCKETS,
+            NUM_STRENGTH_BUCKETS,
+        ]
+        if magic != STRATEGY_MAGIC or version != STRATEGY_VERSION:
+            raise ValueError(f"{path} is not a version {STRATEGY_VERSION} table")
+        if shape != expectedShape:
+            raise ValueError(f"{path} has shape {shape}, expected {expectedShape}")
+
+    def lookup(self, street, position, potOddsIndex, strengthIndex):
+        return self.buffer[
+            HEADER_SIZE + tableOffset(street, position, potOddsIndex, strengthIndex)
+        ]
+
+
+_strategyTable = None
+
+
+def loadStrategyTable():
+    global _strategyTable
+
+    if _strategyTable is None:
+        path = cachePath(STRATEGY_FILE)
+        try:
+            _strategyTable = StrategyTable(path)
+        except (FileNotFoundError, ValueError):
+            # first launch (or an old table): solving only takes a moment
+            from solver import writeStrategyTable
+
+            writeStrategyTable(path)
+            _strategyTable = StrategyTable(path)
+
+    return _strategyTable
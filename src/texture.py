@@ -0,0 +1,263 @@
+import argparse
+import itertools
+import math
+import sys
+import time
+
+import numpy as np
+from treys import Card, Deck
+
+from cache import atomicWrite, cachePath
+
+# * Board texture, looked up for every flop, turn and river
+
+"""
+Every board (as a set of cards) has a number from its sorted card indices
+(the combinatorial number system), which is also its row in the tables
+below, so a lookup is a handful of additions. The tables hold a texture
+bitfield and, for flops and turns, how many unseen cards pair the board,
+bring a third (or fourth) card of a suit, or leave at most one card
+missing from a straight.
+
+The flop tables (22,100 boards) are built the first time they're needed
+and cached on disk like the other tables. Turns (270,725) and rivers
+(2,598,960) take seconds to build, too long for a redraw, so they're only
+built offline (python texture.py); until then a turn or river is worked
+out on its own when it's looked up, in a fraction of a millisecond.
+Building goes street by street in numpy, a chunk of boards at a time
+"""
+
+# texture bits
+PAIRED = 1 << 0
+TWO_PAIRED = 1 << 1
+TRIPS = 1 << 2
+MONOTONE = 1 << 3  # every card the same suit
+TWO_TONE = 1 << 4  # at most two of any suit, and some suit twice
+RAINBOW = 1 << 5  # no suit twice
+FLUSH_POSSIBLE = 1 << 6  # three of a suit
+FOUR_FLUSH = 1 << 7
+CONNECTED = 1 << 8  # three ranks in a row
+STRAIGHT_POSSIBLE = 1 << 9  # three ranks within five
+FOUR_STRAIGHT = 1 << 10  # four ranks within five, one card makes a straight
+BROADWAY_HEAVY = 1 << 11  # two or more cards ten or higher
+DRAW_HEAVY = 1 << 12  # lots of unseen cards complete a flush or straight
+
+TEXTURE_NAMES = [
+    (TRIPS, "trips"),
+    (TWO_PAIRED, "two pair"),
+    (PAIRED, "paired"),
+    (MONOTONE, "monotone"),
+    (FOUR_FLUSH, "four flush"),
+    (TWO_TONE, "two-tone"),
+    (RAINBOW, "rainbow"),
+    (FOUR_STRAIGHT, "four straight"),
+    (CONNECTED, "connected"),
+    (DRAW_HEAVY, "draw-heavy"),
+]
+
+# draw count columns
+PAIRING_CARDS = 0
+FLUSH_CARDS = 1
+STRAIGHT_CARDS = 2
+NUM_DRAW_COUNTS = 3
+
+DRAW_HEAVY_CARDS = 15  # flush + straight cards for DRAW_HEAVY
+BROADWAY_RANK = 8  # ten
+BUILD_CHUNK = 100_000
+LAZY_BUILD_CARDS = 3  # streets small enough to build on first lookup
+NO_DRAWS = (0, 0, 0)  # rivers: there are no more cards to come
+
+# rank * 4 + suit for every card int (ranks 0 to 12 are deuce to ace)
+CARD_INDEX = {
+    card: Card.get_rank_int(card) * 4 + "shdc".index(Card.int_to_str(card)[1])
+    for card in Deck.GetFullDeck()
+}
+BINOMIALS = [[math.comb(n, k) for k in range(6)] for n in range(52)]
+
+
+def rankWindows(width):
+    # rank masks of every run of width ranks, the wheel's ace low included
+    windows = np.zeros((13, 15 - width), dtype=np.int8)
+    for start in range(-1, 14 - width):
+        for rank in range(start, start + width):
+            windows[rank % 13, start + 1] = 1
+    return windows
+
+
+STRAIGHT_WINDOWS = rankWindows(5)
+RUN_WINDOWS = rankWindows(3)
+
+
+def boardNumber(cardIndexes):
+    # cardIndexes sorted ascending
+    return sum(BINOMIALS[index][i + 1] for i, index in enumerate(cardIndexes))
+
+
+def allBoards(numCards):
+    # every board as sorted card indexes, in the order of boardNumber
+    count = math.comb(52, numCards)
+    boards = np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(52), numCards)),
+        dtype=np.int16,
+        count=count * numCards,
+    ).reshape(count, numCards)
+
+    binomials = np.array(BINOMIALS, dtype=np.int64)
+    numbers = sum(binomials[boards[:, i], i + 1] for i in range(numCards))
+    ordered = np.empty_like(boards)
+    ordered[numbers] = boards
+    return ordered
+
+
+def textureChunk(boards):
+    numBoards, numCards = boards.shape
+    ranks = boards // 4
+    suits = boards % 4
+    rankCounts = (ranks[:, :, None] == np.arange(13)).sum(axis=1)
+    suitCounts = (suits[:, :, None] == np.arange(4)).sum(axis=1)
+    present = (rankCounts > 0).astype(np.int8)
+
+    maxRank = rankCounts.max(axis=1)
+    maxSuit = suitCounts.max(axis=1)
+    straightFill = (present @ STRAIGHT_WINDOWS).max(axis=1)
+
+    draws = np.zeros((numBoards, NUM_DRAW_COUNTS), dtype=np.uint8)
+    if numCards < 5:
+        draws[:, PAIRING_CARDS] = ((4 - rankCounts) * present).sum(axis=1)
+        # suits one short of three (or four) on the board
+        oneShort = (suitCounts == 2) | (suitCounts == 3)
+        draws[:, FLUSH_CARDS] = np.where(oneShort, 13 - suitCounts, 0).sum(axis=1)
+        # the four cards of each missing rank that would put four ranks (or
+        # all five) of a straight on the board
+        straightCards = np.zeros(numBoards, dtype=np.int64)
+        for rank in range(13):
+            withRank = present.copy()
+            withRank[:, rank] = 1
+            newFill = (withRank @ STRAIGHT_WINDOWS).max(axis=1)
+            gain = (newFill > straightFill) & (newFill >= 4)
+            straightCards += 4 * (gain & (present[:, rank] == 0))
+        draws[:, STRAIGHT_CARDS] = straightCards
+
+    bits = np.zeros(numBoards, dtype=np.uint16)
+    flags = [
+        (maxRank >= 2, PAIRED),
+        ((rankCounts >= 2).sum(axis=1) >= 2, TWO_PAIRED),
+        (maxRank >= 3, TRIPS),
+        (maxSuit == numCards, MONOTONE),
+        (maxSuit == 2, TWO_TONE),
+        (maxSuit == 1, RAINBOW),
+        (maxSuit >= 3, FLUSH_POSSIBLE),
+        (maxSuit >= 4, FOUR_FLUSH),
+        ((present @ RUN_WINDOWS).max(axis=1) >= 3, CONNECTED),
+        (straightFill >= 3, STRAIGHT_POSSIBLE),
+        (straightFill >= 4, FOUR_STRAIGHT),
+        ((ranks >= BROADWAY_RANK).sum(axis=1) >= 2, BROADWAY_HEAVY),
+        (
+            draws[:, FLUSH_CARDS].astype(int) + draws[:, STRAIGHT_CARDS]
+            >= DRAW_HEAVY_CARDS,
+            DRAW_HEAVY,
+        ),
+    ]
+    for condition, bit in flags:
+        bits[condition] |= bit
+    return bits, draws
+
+
+def buildTextureTables(numCards):
+    boards = allBoards(numCards)
+    bits = np.empty(len(boards), dtype=np.uint16)
+    draws = np.empty((len(boards), NUM_DRAW_COUNTS), dtype=np.uint8)
+    for start in range(0, len(boards), BUILD_CHUNK):
+        chunk = slice(start, start + BUILD_CHUNK)
+        bits[chunk], draws[chunk] = textureChunk(boards[chunk])
+    return bits, draws
+
+
+def texturePaths(numCards):
+    return (
+        cachePath(f"texture_{numCards}_bits.npy"),
+        cachePath(f"texture_{numCards}_draws.npy"),
+    )
+
+
+def saveTextureTables(numCards, bits, draws):
+    # draws first, so a reader that finds the bits finds the draws too
+    bitsPath, drawsPath = texturePaths(numCards)
+    if numCards < 5:
+        with atomicWrite(drawsPath) as drawsFile:
+            np.save(drawsFile, draws)
+    with atomicWrite(bitsPath) as bitsFile:
+        np.save(bitsFile, bits)
+
+
+class TextureIndex:
+    def __init__(self):
+        self.tables = {}  # number of board cards: (bits, draws), or None
+
+    def street(self, numCards):
+        if numCards not in self.tables:
+            bitsPath, drawsPath = texturePaths(numCards)
+            try:
+                bits = np.load(bitsPath)
+                draws = np.load(drawsPath) if numCards < 5 else None
+            except FileNotFoundError:
+                if numCards > LAZY_BUILD_CARDS:
+                    self.tables[numCards] = None  # not built, see lookup
+                    return None
+                bits, draws = buildTextureTables(numCards)
+                saveTextureTables(numCards, bits, draws)
+            self.tables[numCards] = (bits, draws)
+        return self.tables[numCards]
+
+    def lookup(self, board):
+        # (texture bits, draw counts) for a flop, turn or river
+        cardIndexes = sorted(CARD_INDEX[card] for card in board)
+        tables = self.street(len(board))
+        if tables is None:
+            bits, draws = textureChunk(np.array([cardIndexes], dtype=np.int16))
+            number = 0
+            if len(board) == 5:
+                draws = None
+        else:
+            bits, draws = tables
+            number = boardNumber(cardIndexes)
+        if draws is None:
+            return int(bits[number]), NO_DRAWS
+        return int(bits[number]), tuple(draws[number].tolist())
+
+
+_textureIndex = None
+
+
+def loadTextureIndex():
+    global _textureIndex
+
+    if _textureIndex is None:
+        _textureIndex = TextureIndex()
+    return _textureIndex
+
+
+def boardTexture(board):
+    return loadTextureIndex().lookup(board)
+
+
+def textureNames(bits):
+    return [name for bit, name in TEXTURE_NAMES if bits & bit]
+
+
+# * Offline build: python texture.py
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the board texture tables")
+    parser.add_argument(
+        "--streets", nargs="+", type=int, choices=[3, 4, 5], default=[3, 4, 5]
+    )
+    args = parser.parse_args(sys.argv[1:])
+
+    for numCards in args.streets:
+        startTime = time.perf_counter()
+        bits, draws = buildTextureTables(numCards)
+        saveTextureTables(numCards, bits, draws)
+        elapsed = time.perf_counter() - startTime
+        print(f"{len(bits):,} boards of {numCards} cards in {elapsed:.1f}s")
@@ -0,0 +1,300 @@
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from constants import *
+from equity import ESTIMATOR_MODES
+from headless import DEFAULT_LINEUP, quietOutput
+from logic import *
+from snapshot import restoreGame, snapshotGame
+
+# * Headless multi-table tournaments (MTT) between bots
+
+"""
+Entrants are dealt out over as few tables as fit them, and every table
+plays one hand per round. Blinds go up every handsPerLevel rounds on the
+schedule below (doubling once it runs out). After each round busted
+players get their finishing place (ties in a round go to the bigger
+starting stack), then tables are broken while the rest fit on fewer, and
+players are moved from the fullest table to the emptiest until no two
+differ by more than one, so it ends on a single final table.
+
+With workers > 1 the tables of a round are played in a process pool: each
+table goes over as a snapshot (see snapshot.py) and comes back the same
+way. Seats are tracked by entrant number next to each Game, so nothing
+about the players has to survive the trip but their chips
+"""
+
+BLIND_SCHEDULE = (
+    (10, 20),
+    (15, 30),
+    (25, 50),
+    (50, 100),
+    (75, 150),
+    (100, 200),
+    (150, 300),
+    (200, 400),
+    (300, 600),
+    (400, 800),
+    (600, 1200),
+    (800, 1600),
+    (1000, 2000),
+)
+HANDS_PER_LEVEL = 10
+
+
+def blindsForLevel(level, schedule=BLIND_SCHEDULE):
+    if level < len(schedule):
+        return schedule[level]
+    smallBlind, bigBlind = schedule[-1]
+    factor = 2 ** (level - len(schedule) + 1)
+    return smallBlind * factor, bigBlind * factor
+
+
+def playTableHands(args):
+    # process pool worker: one round at one table, snapshot in and out
+    data, numHands = args
+    with quietOutput():
+        game = restoreGame(data)
+        game.run(maxHands=numHands)
+    return snapshotGame(game)
+
+
+class TournamentTable:
+    def __init__(self, game, entrants):
+        self.game = game
+        self.entrants = entrants  # entrant number of each seat
+
+    def __len__(self):
+        return len(self.entrants)
+
+
+class Tournament:
+    def __init__(
+        self,
+        numEntrants,
+        playerClasses=None,
+        seatsPerTable=NUM_PLAYERS,
+        startingChips=INITIAL_CHIPS,
+        schedule=BLIND_SCHEDULE,
+        handsPerLevel=HANDS_PER_LEVEL,
+        numSimulations=100,
+        equityMode="batched",
+        seed=None,
+    ):
+        if not 2 <= seatsPerTable <= NUM_PLAYERS:
+            # the bots' position tables only go up to NUM_PLAYERS seats
+            raise ValueError(f"seatsPerTable must be 2 to {NUM_PLAYERS}")
+
+        self.rng = random.Random(seed)
+        self.seatsPerTable = seatsPerTable
+        self.schedule = schedule
+        self.handsPerLevel = handsPerLevel
+        self.numSimulations = numSimulations
+        self.equityMode = equityMode
+
+        lineup = playerClasses or DEFAULT_LINEUP
+        self.entrantClasses = [lineup[i % len(lineup)] for i in range(numEntrants)]
+        self.places = {}  # entrant: finishing place, 1 is the winner
+        self.rounds = 0
+        self.handsPlayed = 0
+        self.tableBreaks = 0
+        self.playersMoved = 0
+
+        seating = list(range(numEntrants))
+        self.rng.shuffle(seating)
+        numTables = math.ceil(numEntrants / seatsPerTable)
+        self.tables = []
+        with quietOutput():
+            for i in range(numTables):
+                entrants = seating[i::numTables]
+                players = []
+                for entrant in entrants:
+                    player = self.entrantClasses[entrant](Deck())
+                    player.chips = startingChips
+                    players.append(player)
+                game = Game(
+                    numSimulations=numSimulations,
+                    equityMode=equityMode,
+                    players=players,
+                    blinds=self.blinds(),
+                )
+                self.tables.append(TournamentTable(game, entrants))
+
+    def blinds(self):
+        return blindsForLevel(self.rounds // self.handsPerLevel, self.schedule)
+
+    def playersLeft(self):
+        return sum(len(table) for table in self.tables)
+
+    def isOver(self):
+        return self.playersLeft() < 2
+
+    def playRound(self, pool=None):
+        chipsBefore = {}
+        for table in self.tables:
+            for entrant, player in zip(table.entrants, table.game.players):
+                chipsBefore[entrant] = player.chips
+
+        if pool is None:
+            with quietOutput():
+                for table in self.tables:
+                    table.game.run(maxHands=1)
+        else:
+            snapshots = pool.map(
+                playTableHands,
+                [(snapshotGame(table.game), 1) for table in self.tables],
+            )
+            for table, data in zip(self.tables, snapshots):
+                table.game = restoreGame(data)
+
+        self.rounds += 1
+        self.handsPlayed += len(self.tables)
+        self.removeBusted(chipsBefore)
+        self.breakTables()
+        self.balanceTables()
+
+        blinds = self.blinds()
+        for table in self.tables:
+            table.game.smallBlindAmount, table.game.bigBlindAmount = blinds
+
+        if self.isOver():
+            for table in self.tables:
+                for entrant in table.entrants:
+                    self.places[entrant] = 1
+
+    def removeBusted(self, chipsBefore):
+        busted = []
+        for table in self.tables:
+            seats = [
+                (entrant, player)
+                for entrant, player in zip(table.entrants, table.game.players)
+            ]
+            busted += [entrant for entrant, player in seats if player.chips == 0]
+            kept = [(entrant, player) for entrant, player in seats if player.chips > 0]
+            if len(kept) < len(seats):
+                self.reseat(table, kept)
+
+        # whoever started the round with less finishes lower
+        place = self.playersLeft() + len(busted)
+        for entrant in sorted(busted, key=chipsBefore.__getitem__):
+            self.places[entrant] = place
+            place -= 1
+        self.tables = [table for table in self.tables if len(table)]
+
+    def reseat(self, table, seats):
+        table.entrants = [entrant for entrant, _ in seats]
+        if seats:
+            table.game.seatPlayers([player for _, player in seats])
+
+    def takeSeats(self, table, count):
+        # the last count seats, as (entrant, player) pairs
+        seats = list(zip(table.entrants, table.game.players))
+        self.reseat(table, seats[: len(seats) - count])
+        return seats[len(seats) - count :]
+
+    def breakTables(self):
+        while len(self.tables) > math.ceil(self.playersLeft() / self.seatsPerTable):
+            smallest = min(self.tables, key=len)
+            self.tables.remove(smallest)
+            self.tableBreaks += 1
+            for seat in self.takeSeats(smallest, len(smallest)):
+                target = min(self.tables, key=len)
+                self.addSeat(target, seat)
+
+    def balanceTables(self):
+        while True:
+            fullest = max(self.tables, key=len)
+            emptiest = min(self.tables, key=len)
+            if len(fullest) - len(emptiest) <= 1:
+                return
+            self.addSeat(emptiest, self.takeSeats(fullest, 1)[0])
+
+    def addSeat(self, table, seat):
+        entrant, player = seat
+        seats = list(zip(table.entrants, table.game.players))
+        seats.insert(self.rng.randrange(len(seats) + 1), (entrant, player))
+        self.reseat(table, seats)
+        self.playersMoved += 1
+
+    def play(self, workers=1, maxRounds=None):
+        pool = multiprocessing.Pool(workers) if workers > 1 else None
+        try:
+            while not self.isOver():
+                if maxRounds is not None and self.rounds >= maxRounds:
+                    break
+                self.playRound(pool)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return self.standings()
+
+    def standings(self):
+        # (place, entrant, bot class name), winner first
+        return sorted(
+            (place, entrant, self.entrantClasses[entrant].__name__)
+            for entrant, place in self.places.items()
+        )
+
+
+def summarizeByBot(standings, numEntrants):
+    # per bot: entrants, wins and mean finishing percentile (0 is first)
+    summary = {}
+    for place, _, botName in standings:
+        entry = summary.setdefault(botName, {"entrants": 0, "wins": 0, "finish": 0.0})
+        entry["entrants"] += 1
+        entry["wins"] += place == 1
+        entry["finish"] += (place - 1) / max(numEntrants - 1, 1)
+    for entry in summary.values():
+        entry["finish"] /= entry["entrants"]
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a headless bot tournament")
+    parser.add_argument("--entrants", type=int, default=1000)
+    parser.add_argument("--seats", type=int, default=NUM_PLAYERS)
+    parser.add_argument("--chips", type=int, default=INITIAL_CHIPS)
+    parser.add_argument("--hands-per-level", type=int, default=HANDS_PER_LEVEL)
+    parser.add_argument("--simulations", type=int, default=100)
+    parser.add_argument("--equity", choices=ESTIMATOR_MODES, default="batched")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(sys.argv[1:])
+
+    startTime = time.perf_counter()
+    tournament = Tournament(
+        args.entrants,
+        seatsPerTable=args.seats,
+        startingChips=args.chips,
+        handsPerLevel=args.hands_per_level,
+        numSimulations=args.simulations,
+        equityMode=args.equity,
+        seed=args.seed,
+    )
+    standings = tournament.play(args.workers)
+    elapsed = time.perf_counter() - startTime
+
+    print(
+        f"{args.entrants:,} entrants, {tournament.handsPlayed:,} hands in "
+        f"{tournament.rounds:,} rounds, {elapsed:.1f}s"
+    )
+    print(
+        f"{tournament.tableBreaks:,} tables broken, "
+        f"{tournament.playersMoved:,} players moved, "
+        f"final blinds {tournament.blinds()}"
+    )
+    print("top 10:")
+    for place, entrant, botName in standings[:10]:
+        print(f"  {place:>4}. entrant {entrant} ({botName})")
+    print("by bot (finish: mean percentile, 0 is first):")
+    for botName, entry in summarizeByBot(standings, args.entrants).items():
+        print(
+            f"  {botName}: {entry['entrants']} entrants, {entry['wins']} wins, "
+            f"finish {entry['finish']:.3f}"
+        )